@@ -0,0 +1,56 @@
+''' Benchmarks encode_dummies against the eight np.where passes it replaced in prep_copd.
+    Run from the repo root: python benchmarks/bench_dummies.py [rows ...]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wrangle import DEMOGRAPHIC_DUMMIES, encode_dummies
+
+# Stratification1 values seen in the CDI rows prep_copd keeps
+DEMOGRAPHICS = ['Overall', 'Male', 'Female'] + list(DEMOGRAPHIC_DUMMIES.values())[1:]
+
+
+def where_dummies(df_sample):
+    ''' The original encoding: one full string comparison per dummy column '''
+    for column, value in DEMOGRAPHIC_DUMMIES.items():
+        df_sample[column] = np.where(df_sample['Demographics'] == value, 1, 0).astype(int)
+    return df_sample
+
+
+def best_of(func, repeat=3):
+    ''' Best wall time of repeat calls '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes):
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>12} {'np.where x8':>12} {'encode':>12} {'encode cat':>12} {'sparse':>12} {'speedup':>8}")
+    for rows in sizes:
+        demographics = pd.Series(rng.choice(DEMOGRAPHICS, rows), dtype=object)
+        categorical = demographics.astype('category')
+        frame = pd.DataFrame({'Demographics': demographics})
+
+        # both encodings must agree before their timings mean anything
+        expected = where_dummies(frame.copy())[list(DEMOGRAPHIC_DUMMIES)]
+        assert (encode_dummies(demographics).to_numpy() == expected.to_numpy()).all()
+
+        where_time = best_of(lambda: where_dummies(frame.copy()))
+        encode_time = best_of(lambda: encode_dummies(demographics))
+        categorical_time = best_of(lambda: encode_dummies(categorical))
+        sparse_time = best_of(lambda: encode_dummies(categorical, sparse=True))
+        print(f'{rows:>12,} {where_time:>11.3f}s {encode_time:>11.3f}s {categorical_time:>11.3f}s '
+              f'{sparse_time:>11.3f}s {where_time / categorical_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(rows) for rows in sys.argv[1:]] or [1000000, 10000000])
@@ -0,0 +1,69 @@
+''' Compares training from the X_y_split DataFrames with training from FeatureMatrix inputs
+    (dense float32 and CSR): feature memory, pickled size sent to the worker processes, and the
+    fit/predict times train_models reports. Uses a synthetic CDI csv (wrangle.synthetic).
+    Run from the repo root: python benchmarks/bench_features.py [rows ...]
+'''
+import contextlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wrangle import X_y_matrices, X_y_split, generate_cdi, prep_copd, split_sample, train_models
+
+
+def prepared_sample(rows, work_dir):
+    ''' Prepared rows of a synthetic csv (prep_copd writes COPD.csv into the working directory) '''
+    path = generate_cdi(os.path.join(work_dir, 'cdi.csv'), rows, verbose=False)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return prep_copd(path, sample_size=None)
+    finally:
+        os.chdir(cwd)
+
+
+def fit_predict_times(results):
+    ''' Fit time and summed predict time per model from a train_models results table '''
+    grouped = results.groupby('model')
+    return grouped['fit_time'].first(), grouped['predict_time'].sum(), grouped['accuracy'].last()
+
+
+def main(sizes):
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            df_sample = prepared_sample(rows, work_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sample_train, sample_validate, sample_test = split_sample(df_sample)
+        frames = X_y_split(sample_train, sample_validate, sample_test)
+        inputs = {'DataFrame': frames}
+        for layout in ('dense', 'sparse'):
+            train, validate, test = X_y_matrices(sample_train, sample_validate, sample_test, layout=layout)
+            inputs[layout] = (train, train.y, validate, validate.y, test, test.y)
+
+        print(f'\n{rows:,} csv rows, {len(frames[0]):,} training rows')
+        print(f"{'input':<10} {'X_train MB':>11} {'pickled MB':>11} {'model':<20} {'fit':>8} {'predict':>8} {'accuracy':>9}")
+        for name, args in inputs.items():
+            X_train = args[0]
+            memory = X_train.memory_usage(deep=True).sum() if name == 'DataFrame' else X_train.nbytes
+            pickled = len(pickle.dumps(X_train, protocol=pickle.HIGHEST_PROTOCOL))
+            with contextlib.redirect_stdout(io.StringIO()):
+                results, _ = train_models(*args)
+            fit, predict, accuracy = fit_predict_times(results)
+            for i, model in enumerate(fit.index):
+                sizes_text = f'{memory / 1e6:>11.1f} {pickled / 1e6:>11.1f}' if i == 0 else ' ' * 23
+                label = name if i == 0 else ''
+                print(f'{label:<10} {sizes_text} {model:<20} {fit[model]:>7.3f}s {predict[model]:>7.3f}s '
+                      f'{accuracy[model]:>9.4f}')
+
+        # the same models must come out of every input
+        assert np.allclose(train.X.toarray(), inputs['dense'][0].X)
+
+
+if __name__ == '__main__':
+    main([int(rows) for rows in sys.argv[1:]] or [1000000])
@@ -0,0 +1,93 @@
+''' Cold-start import cost of each wrangle entry point, from python -X importtime.
+    Every entry point is imported in a fresh interpreter (best of --repeat runs) and compared with
+    benchmarks/import_baseline.json; exits 1 when one regresses past the tolerance or when a data-prep
+    entry point pulls in the plotting/ML stack.
+    Run from the repo root: python benchmarks/bench_import.py [--update] [--repeat 5] [--tolerance 0.25]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'import_baseline.json')
+
+# Entry point -> the name imported from wrangle
+ENTRY_POINTS = {'prep': 'prep_copd', 'split': 'split_sample', 'stats': 'chi_square_tests',
+                'train': 'train_models', 'predict': 'predict_batch', 'report': 'build_report'}
+
+# Modules the data-prep entry point must not import
+PREP_FORBIDDEN = ['matplotlib', 'seaborn', 'sklearn', 'scipy.stats']
+
+# Regressions smaller than this many milliseconds are noise whatever the ratio
+MIN_REGRESSION_MS = 20
+
+
+def import_profile(name):
+    ''' Total import time in ms and the set of modules imported by "from wrangle import name" '''
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'from wrangle import {name}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    # lines look like 'import time:  self [us] | cumulative | imported package', nested imports indented
+    total_us, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        modules.add(module.strip())
+        if not module.startswith('  '):
+            # top-level imports: their cumulative times add up to the whole cost
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def measure(repeat):
+    ''' Best-of-repeat import time per entry point, plus the modules each one loads '''
+    timings, loaded = {}, {}
+    for entry, name in ENTRY_POINTS.items():
+        runs = [import_profile(name) for _ in range(repeat)]
+        timings[entry] = min(ms for ms, _ in runs)
+        loaded[entry] = runs[0][1]
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per entry point')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown over the baseline')
+    parser.add_argument('--update', action='store_true', help='write the measured times as the new baseline')
+    args = parser.parse_args()
+
+    timings, loaded = measure(args.repeat)
+    baseline = {}
+    if os.path.isfile(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)['import_ms']
+
+    failures = []
+    print(f"{'entry point':<12} {'import':>10} {'baseline':>10} {'change':>8}")
+    for entry, ms in timings.items():
+        base = baseline.get(entry)
+        base_text, change = (f'{base:.1f}ms', f'{ms / base - 1:+.0%}') if base else ('-', '')
+        print(f'{entry:<12} {ms:>8.1f}ms {base_text:>10} {change:>8}')
+        if base and ms > base * (1 + args.tolerance) and ms - base > MIN_REGRESSION_MS:
+            failures.append(f'{entry} import regressed: {ms:.1f}ms vs baseline {base:.1f}ms')
+
+    leaked = [module for module in PREP_FORBIDDEN if module in loaded['prep']]
+    if leaked:
+        failures.append(f'prep_copd imports {", ".join(leaked)}')
+
+    if args.update:
+        with open(BASELINE, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'import_ms': {k: round(v, 1) for k, v in timings.items()}},
+                      f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {BASELINE}')
+    for failure in failures:
+        print('FAIL:', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
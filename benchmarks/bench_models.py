@@ -0,0 +1,85 @@
+''' Side-by-side comparison of the registry models: test accuracy, Brier score and predicted vs observed
+    prevalence, fit time, batch predict time and single-row predict latency, uncalibrated and with
+    isotonic calibration. Uses a prepared COPD.csv when given, otherwise a synthetic CDI csv.
+    Run from the repo root: python benchmarks/bench_models.py [--prepared COPD.csv | --rows 1M]
+'''
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wrangle import X_y_split, generate_cdi, model_input, parse_rows, prep_copd, split_sample, train_models
+
+
+def prepared_sample(args):
+    ''' The prepared frame: read from --prepared, or prepared from a synthetic csv of --rows rows '''
+    if args.prepared:
+        return pd.read_csv(args.prepared)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = generate_cdi(os.path.join(work_dir, 'cdi.csv'), parse_rows(args.rows), verbose=False)
+        # prep_copd writes COPD.csv into the working directory
+        os.chdir(work_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return prep_copd(path, sample_size=None)
+        finally:
+            os.chdir(cwd)
+
+
+def single_row_latency(model, X, repeat):
+    ''' Median predict_proba time for one row, in milliseconds '''
+    X = model_input(X)
+    rows = X.iloc[:1] if hasattr(X, 'iloc') else X[:1]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(rows)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prepared', default=None, help='csv written by prep_copd (default: synthetic data)')
+    parser.add_argument('--rows', default='1M', help='synthetic CDI rows when no --prepared csv is given')
+    parser.add_argument('--latency-repeat', type=int, default=200, help='single-row predictions timed per model')
+    args = parser.parse_args()
+
+    df_sample = prepared_sample(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        splits = X_y_split(*split_sample(df_sample))
+    X_test = splits[4]
+    print(f'{len(splits[0]):,} training rows, {len(X_test):,} test rows')
+
+    tables = []
+    for calibrate in (None, 'isotonic'):
+        results, fitted = train_models(*splits, calibrate=calibrate)
+        test = results[results['split'] == 'test'].set_index('model')
+        test['us_per_row'] = test['predict_time'] / len(X_test) * 1e6
+        test['latency_ms'] = [single_row_latency(fitted[name], X_test, args.latency_repeat) for name in test.index]
+        test['calibration'] = calibrate or 'none'
+        tables.append(test)
+
+    table = pd.concat(tables).reset_index()
+    columns = ['calibration', 'model', 'accuracy', 'brier', 'predicted_prevalence', 'observed_prevalence',
+               'fit_time', 'predict_time', 'us_per_row', 'latency_ms', 'model_size_mb']
+    with pd.option_context('display.width', 200):
+        print(table[columns].round(4).to_string(index=False))
+
+    forest = table[(table['calibration'] == 'none') & (table['model'] == 'Random Forest')].iloc[0]
+    boosting = table[(table['calibration'] == 'none') & (table['model'] == 'Gradient Boosting')].iloc[0]
+    print(f"Gradient Boosting vs Random Forest: accuracy {boosting['accuracy'] - forest['accuracy']:+.4f}, "
+          f"fit {boosting['fit_time'] / forest['fit_time']:.2f}x, predict {boosting['predict_time'] / forest['predict_time']:.2f}x, "
+          f"size {boosting['model_size_mb'] / forest['model_size_mb']:.3f}x")
+
+
+if __name__ == '__main__':
+    main()
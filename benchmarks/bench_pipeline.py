@@ -0,0 +1,186 @@
+''' Pipeline benchmark suite on synthetic CDI data (wrangle.synthetic), so it runs without the real csv.
+    Times prep_copd, split_sample, X_y_split, the chi-square tests and train_models at each scale, with
+    throughput and peak memory. Every run is appended to benchmarks/data/pipeline_history.jsonl; runs are
+    compared with benchmarks/pipeline_baseline.json (when it was recorded on as many cores) and the
+    script exits 1 when a benchmark regresses.
+    Run from the repo root: python benchmarks/bench_pipeline.py [--scales 100k,1M] [--repeat 3] [--update]
+'''
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from wrangle import (X_y_split, Stage, chi_square_tests, gender_stat, prep_copd, race_stats, split_sample,
+                     train_models, tracing, year_stat1)
+from wrangle.synthetic import generate_cdi, parse_rows
+
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+BASELINE = os.path.join(BENCH_DIR, 'pipeline_baseline.json')
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+HISTORY = os.path.join(DATA_DIR, 'pipeline_history.jsonl')
+
+# Differences below these are noise whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MB = 5
+
+
+def dataset(rows, data_dir):
+    ''' Path of the synthetic csv for a scale, generated on first use and reused afterwards '''
+    path = os.path.join(data_dir, f'synthetic_cdi_{rows}.csv')
+    if not os.path.isfile(path):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_cdi(path, rows)
+    return path
+
+
+def quiet(func):
+    ''' func with its printing swallowed (split_sample and the *_stat functions report as they go) '''
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return run
+
+
+def best_of(func, repeat):
+    ''' Best wall time of repeat calls and the last result '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def peak_memory(func):
+    ''' Memory allocated at the peak of one traced call, in MB (worker processes are not included) '''
+    with tracing(memory=True, verbose=False) as records:
+        with Stage('benchmark'):
+            func()
+    return records[-1]['peak_added_mb']
+
+
+def chi_square_stats(sample_train):
+    ''' The gender, race and year chi-square stat functions on sample_train '''
+    gender_stat(sample_train)
+    race_stats(sample_train)
+    year_stat1(sample_train, None)
+
+
+def run_scale(rows, data_dir, repeat, max_train_rows, memory):
+    ''' Benchmarks every stage on the synthetic csv of rows rows; returns one result row per stage '''
+    path = dataset(rows, data_dir)
+    results = []
+
+    def bench(name, func, rows_in):
+        seconds, result = best_of(func, repeat)
+        row = {'benchmark': name, 'scale': rows, 'rows': rows_in, 'seconds': seconds,
+               'rows_per_sec': rows_in / max(seconds, 1e-9), 'peak_mb': peak_memory(func) if memory else None}
+        results.append(row)
+        peak = '' if row['peak_mb'] is None else f"{row['peak_mb']:>10,.1f} MB"
+        print(f"{name:<18} {rows:>12,} {rows_in:>12,} {seconds:>9.3f}s {row['rows_per_sec']:>14,.0f}/s {peak}")
+        return result
+
+    # prep_copd writes COPD.csv and the cube to the working directory
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        df_sample = bench('prep_copd', quiet(lambda: prep_copd(path, sample_size=None)), rows)
+    finally:
+        os.chdir(cwd)
+    sample_train, sample_validate, sample_test = bench('split_sample', quiet(lambda: split_sample(df_sample)),
+                                                       len(df_sample))
+    splits = bench('X_y_split', lambda: X_y_split(sample_train, sample_validate, sample_test), len(df_sample))
+    bench('chi_square_tests', lambda: chi_square_tests(sample_train), len(sample_train))
+    bench('chi_square_stats', quiet(lambda: chi_square_stats(sample_train)), len(sample_train))
+
+    # the forest on tens of millions of rows is out of scope; train on at most max_train_rows
+    X_train, y_train, X_validate, y_validate, X_test, y_test = (split.iloc[:max_train_rows] for split in splits)
+    bench('train_models', quiet(lambda: train_models(X_train, y_train, X_validate, y_validate, X_test, y_test)),
+          len(X_train))
+    return results
+
+
+def regressions(results, baseline, tolerance, memory_tolerance):
+    ''' Messages for the results slower or hungrier than their baseline '''
+    found = []
+    for row in results:
+        base = baseline.get(f"{row['benchmark']}@{row['scale']}")
+        if not base:
+            continue
+        if row['seconds'] > base['seconds'] * (1 + tolerance) and row['seconds'] - base['seconds'] > MIN_REGRESSION_SECONDS:
+            found.append(f"{row['benchmark']} at {row['scale']:,} rows: {row['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+        if (row['peak_mb'] is not None and base.get('peak_mb') is not None
+                and row['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance)
+                and row['peak_mb'] - base['peak_mb'] > MIN_REGRESSION_MB):
+            found.append(f"{row['benchmark']} at {row['scale']:,} rows: peak {row['peak_mb']:,.1f} MB "
+                         f"vs baseline {base['peak_mb']:,.1f} MB")
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='100k,1M', help='comma separated row counts, e.g. 100k,1M,10M,100M')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (best is kept)')
+    parser.add_argument('--max-train-rows', type=int, default=1000000, help='training rows for train_models')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='synthetic csv directory')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown over the baseline')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='allowed peak memory growth')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak-memory runs')
+    parser.add_argument('--update', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<18} {'scale':>12} {'rows':>12} {'best':>10} {'throughput':>16} {'peak':>13}")
+    results = []
+    for scale in args.scales.split(','):
+        results += run_scale(parse_rows(scale), os.path.abspath(args.data_dir), args.repeat, args.max_train_rows,
+                             not args.no_memory)
+
+    run = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+           'python': sys.version.split()[0], 'cpus': os.cpu_count(), 'repeat': args.repeat, 'results': results}
+    os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+    with open(HISTORY, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+    baseline = {}
+    if os.path.isfile(BASELINE):
+        with open(BASELINE) as f:
+            stored = json.load(f)
+        # timings from another core count say nothing about a regression
+        if stored.get('cpus') == run['cpus']:
+            baseline = stored['results']
+        else:
+            print(f"Baseline was recorded on {stored.get('cpus')} cpus, this machine has {run['cpus']}: not compared"
+                  + ('; --update replaces it' if args.update else ''))
+    failures = regressions(results, baseline, args.tolerance, args.memory_tolerance)
+    if args.update:
+        # scales not run this time keep their previous baseline (from the same core count)
+        baseline.update({f"{row['benchmark']}@{row['scale']}": {'seconds': round(row['seconds'], 4),
+                                                                'peak_mb': row['peak_mb'] and round(row['peak_mb'], 1)}
+                         for row in results})
+        with open(BASELINE, 'w') as f:
+            json.dump({'commit': run['commit'], 'python': run['python'], 'cpus': run['cpus'], 'results': baseline},
+                      f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {BASELINE}')
+    for failure in failures:
+        print('REGRESSION:', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
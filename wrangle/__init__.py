@@ -0,0 +1,65 @@
+''' DHHS CDI COPD prevalence analysis.
+
+    Every name is importable from the package (from wrangle import prep_copd, import wrangle as w),
+    but each submodule is only imported on first use: data prep loads pandas and NumPy alone, and
+    matplotlib/seaborn, scipy.stats and scikit-learn wait for the graphs, tests and models that need them.
+'''
+import importlib
+
+# Submodule -> the public names it defines
+SUBMODULES = {
+    'prepare': ['CDI_CSV', 'CDI_DTYPES', 'COLUMNS_TO_REMOVE', 'RENAME_COLUMNS', 'TOPICS_TO_REMOVE', 'GEO_PATTERN',
+                'FEATURE_COLUMNS', 'DEMOGRAPHIC_DUMMIES', 'concat_chunks', 'read_cdi_chunks', 'read_cdi_chunked',
+                'reservoir_sample', 'trim_reservoir', 'encode_dummies', 'parse_geo', 'state_coordinates', 'clean_copd',
+                'CATEGORY_COLUMNS', 'CACHE_DIR', 'CACHE_VERSION', 'file_fingerprint', 'cache_key', 'write_cache',
+                'read_cache', 'encode_features', 'optimize_dtypes', 'prep_copd', 'CUBE_COLUMNS', 'CUBE_CSV',
+                'RACE_GROUPS', 'CONTINGENCY_COLUMNS', 'build_cube', 'load_cube', 'as_cube', 'cube_counts'],
+    'split': ['split_sample', 'X_y_split', 'IndexSplit', 'split_indices', 'kfold_indices', 'year_split_indices'],
+    'stats': ['factorize_column', 'count_table', 'contingency_tables', 'contingency_table',
+              'observed_table', 'chi_square_tests', 'expected_counts', 'gender_stat', 'race_stats', 'year_stat1',
+              'year_stat', 'chi2_statistic', 'cramers_v_statistic', 'spearman_statistic', 'RESAMPLING_STATISTICS',
+              'two_row_table', 'resample_tables', 'resampled_statistic', 'resample', 'permutation_test',
+              'bootstrap_ci', 'resampling_tests'],
+    'explore': ['demographic_graph', 'gender_graph', 'gender_observed', 'gender_graph2', 'race_graph',
+                'race_observed', 'year_graph', 'state_map_counts', 'build_map', 'map_graph'],
+    'model': ['MODELS', 'THREADED_ESTIMATORS', 'CALIBRATION_METHODS', 'estimator_input', 'fit_model',
+              'calibrate_model', 'fit_and_predict', 'score_predictions', 'run_models', 'train_models',
+              'SEARCH_SPACES', 'take_rows', 'init_search_worker', 'rung_data', 'run_trial', 'load_trials',
+              'trial_key', 'hash_data', 'search_data_key', 'search_models',
+              'stream_features', 'holdout_mask', 'streaming_metrics', 'train_out_of_core'],
+    'inference': ['MODEL_FORMAT_VERSION', 'save_model', 'load_model', 'scoring_input', 'read_input_chunks',
+                  'predict_batch'],
+    'report': ['render_figure', 'write_report_index', 'build_report'],
+    'features': ['FEATURE_SCHEMA_VERSION', 'FeatureMatrix', 'model_input', 'build_feature_matrix', 'X_y_matrices'],
+    'pipeline': ['PIPELINE_STORE', 'PIPELINE_STORE_MB', 'PIPELINE_VERSION', 'PIPELINE', 'merge_params',
+                 'pipeline_params', 'pipeline_order', 'function_source', 'stage_keys', 'store_path', 'store_files',
+                 'remove_output', 'output_size', 'store_get', 'store_put', 'evict_store', 'run_stage',
+                 'pipeline_leaves', 'plan_pipeline', 'run_pipeline', 'write_figures'],
+    'incremental': ['PARTITION_DIR', 'PARTITION_KEYS', 'partition_name', 'partition_hashes', 'read_partition_rows',
+                    'partition_batches', 'partition_tables', 'read_manifest', 'write_partition',
+                    'prep_copd_incremental', 'partition_paths', 'load_partitions', 'load_partition_cube',
+                    'combine_partition_tables', 'load_partition_tables'],
+    'synthetic': ['CDI_COLUMNS', 'SYNTHETIC_TOPICS', 'SYNTHETIC_STRATIFICATIONS', 'SYNTHETIC_LOCATIONS',
+                  'SYNTHETIC_YEARS', 'synthetic_cdi_chunk', 'generate_cdi', 'parse_rows'],
+    'instrument': ['Stage', 'traced', 'tracing', 'enable_tracing', 'disable_tracing', 'tracing_enabled',
+                   'record_stage', 'count_rows', 'chrome_trace', 'write_trace', 'trace_table'],
+}
+
+# Public name -> submodule, for the lazy lookup below
+_EXPORTS = {name: module for module, names in SUBMODULES.items() for name in names}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    ''' Imports the submodule defining name on first access and caches the attribute on the package '''
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
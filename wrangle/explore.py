@@ -0,0 +1,333 @@
+''' EDA graphs and the US map of COPD '''
+import os
+
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from .prepare import RACE_GROUPS, cube_counts, state_coordinates
+from .stats import observed_table
+
+
+def demographic_graph(df_sample):
+    ''' Bar plot of the counts per demographic; takes the prepared rows or their count cube '''
+    # Get the counts of the desired demographic categories in the 'Demographics' column, largest first
+    demo_copd = cube_counts(df_sample, 'Demographics', Demographics=RACE_GROUPS + ['Male', 'Female'])
+    demo_copd = demo_copd.sort_values(ascending=False)
+    demo_copd.index = demo_copd.index.astype(str)
+
+    # Create a bar plot using Seaborn
+    plt.figure(figsize=(12, 10))
+    dc = sns.barplot(x=demo_copd.index, y=demo_copd.values, palette='Blues')
+
+    # Set labels and title
+    plt.xlabel('Demographics')
+    plt.ylabel('Count')
+    plt.title('Counts by Demographics')
+
+    # Rotate x-axis labels by 45 degrees
+    plt.xticks(rotation=45)
+
+    # Add count numbers on bars
+    for p in dc.patches:
+        width = p.get_width()
+        height = p.get_height()
+        x, y = p.get_xy()
+        offset = width * 0.02  # Adjust the offset percentage as needed
+        dc.annotate(format(height, '.0f'), (x + width / 2., y + height), ha='center', va='center', xytext=(0, 5), textcoords='offset points')
+
+    # Show the plot
+    plt.tight_layout()
+    plt.show()
+
+
+#------- GENDER VS COPD-----
+def gender_graph(sample_train):
+    ''' Graphs Gender vs COPD from the prepared rows or their Yes_COPD x Yes_female count table '''
+    new_labels = {'no COPD': 'No COPD', 'COPD': 'COPD'}
+    x = ['Female', 'Male']
+    # Set a larger figure size
+    plt.figure(figsize=(10, 6))
+
+    # Visualizing the Gender vs COPD from the Yes_COPD x Yes_female count table
+    gender_counts = observed_table(sample_train, 'Yes_female').stack().rename('count').reset_index()
+    gg = sns.barplot(data=gender_counts, x='Yes_female', y='count', hue='Yes_COPD', palette='Blues')
+    
+    # Modify the legend labels
+    handles, _ = gg.get_legend_handles_labels()
+    gg.legend(handles, ['No COPD', 'COPD'], title='COPD')
+    #Modify the legend labels
+    # legend.get_texts()[0].set_text(new_labels['no COPD'])
+    # legend.get_texts()[1].set_text(new_labels['COPD'])
+    plt.xticks(range(len(x)), x)
+    
+    gg.set_xlabel('Gender')
+    gg.set_ylabel('Number of Observations')
+    plt.title('How Gender Relates to COPD?')
+    
+    # Rotate x-axis labels by 45 degrees
+    plt.xticks(rotation=0)
+    
+    # Add count numbers on bars
+    for p in gg.patches:
+        width = p.get_width()
+        height = p.get_height()
+        x, y = p.get_xy()    
+        offset = width * 0.02  # Adjust the offset percentage as needed
+        gg.annotate(format(height, '.0f'), (x + width / 2., y + height), ha='center', va='center', xytext=(0, 5), textcoords='offset points')
+    
+    # Use tight layout
+    plt.tight_layout()
+    
+    plt.show()
+
+def gender_observed(sample_train):
+    ''' This functions graphs Observed vs COPD (takes the rows or their Yes_COPD x Yes_female count table)''' 
+    alpha = 0.05    
+    gender_observed = observed_table(sample_train, 'Yes_female')
+    # Assuming you have a DataFrame 'sample_train' with the required data
+    new_labels = {'no COPD': 'No COPD', 'COPD': 'COPD'}
+    # Plot the observed data as a bar plot
+    go =gender_observed.plot(kind='bar', stacked=True, color=['pink','skyblue' ], edgecolor='black')
+    # Access the legend object
+    legend = go.legend()
+        
+    # Modify the legend labels
+    legend.get_texts()[0].set_text(new_labels['no COPD'])
+    legend.get_texts()[1].set_text(new_labels['COPD'])
+    
+    # Set the labels and title
+    plt.xlabel('COPD Status')
+    plt.ylabel('Count')
+    plt.title('Observed COPD Status by Gender')
+    plt.legend(title='Gender', loc='upper right', labels=['Female', 'Male'])
+    
+    # Rename the x-axis labels
+    go.set_xticklabels(['No COPD', 'Yes COPD'], rotation=0)
+    
+    # Rotate x-axis labels by 45 degrees
+    plt.xticks(rotation=0)
+        
+    # Add count numbers on bars
+    for p in go.patches:
+        width = p.get_width()
+        height = p.get_height()
+        x, y = p.get_xy()    
+        offset = width * 0.02  # Adjust the offset percentage as needed
+        go.annotate(format(height, '.0f'), (x + width / 2., y + height), ha='center', va='center', xytext=(0, 5), textcoords='offset points')
+        
+    # Use tight layout
+    plt.tight_layout()
+    plt.show()
+    
+def gender_graph2(sample_train):
+    # Yes_COPD x Yes_female count table of the rows (or the table itself)
+    gender_observed = observed_table(sample_train, 'Yes_female')
+    new_labels = {'no COPD': 'No COPD', 'COPD': 'COPD'}
+    # Plot the observed data as a bar plot
+    go =gender_observed.plot(kind='bar', stacked=True, color=['pink','skyblue' ], edgecolor='black')
+    # Access the legend object
+    legend = go.legend()
+        
+    # Modify the legend labels
+    legend.get_texts()[0].set_text(new_labels['no COPD'])
+    legend.get_texts()[1].set_text(new_labels['COPD'])
+    
+    # Set the labels and title
+    plt.xlabel('COPD Status')
+    plt.ylabel('Count')
+    plt.title('Observed COPD Status by Gender')
+    plt.legend(title='Yes_female', loc='upper right', labels=['Female', 'Male'])
+    
+    # Rename the x-axis labels
+    go.set_xticklabels(['No COPD', 'Yes COPD'], rotation=0)
+    
+    # Rotate x-axis labels by 45 degrees
+    plt.xticks(rotation=0)
+        
+    # Add count numbers on bars
+    for p in go.patches:
+        width = p.get_width()
+        height = p.get_height()
+        x, y = p.get_xy()    
+        offset = width * 0.02  # Adjust the offset percentage as needed
+        go.annotate(format(height, '.0f'), (x + width / 2., y + height), ha='center', va='center', xytext=(0, 5), textcoords='offset points')
+        
+    # Use tight layout
+    plt.tight_layout()
+    plt.show()
+
+
+#------- RACE VS COPD-----
+
+def race_graph(sample_train):
+    ''' This function graphs Race/Ethnicity vs COPD from the count cube (or the rows it is built from)'''
+    # Counts per race/ethnicity value and COPD status
+    race_graph_df = cube_counts(sample_train, ['Demographics', 'Yes_COPD'], Demographics=RACE_GROUPS).reset_index()
+    # plain strings so a categorical (compact) column does not plot its unused categories
+    race_graph_df['Demographics'] = race_graph_df['Demographics'].astype(str)
+    
+    #relabel
+    new_labels = {'no COPD': 'No COPD', 'COPD': 'COPD'}
+    
+    # Set a larger figure size
+    plt.figure(figsize=(10, 6))
+    
+    # Visualizing the Race/Ethnicity vs COPD
+    eg = sns.barplot(data=race_graph_df, x='Demographics', y='count', hue='Yes_COPD', palette='Blues')
+    
+    # Access the legend object
+    legend = eg.legend()
+    
+    # Modify the legend labels
+    legend.get_texts()[0].set_text(new_labels['no COPD'])
+    legend.get_texts()[1].set_text(new_labels['COPD'])
+    
+    eg.set_xlabel('Race/Ethnicity')
+    eg.set_ylabel('Number of Observations')
+    plt.title('Race/Ethnicity vs COPD')
+    
+    # Rotate x-axis labels by 45 degrees
+    plt.xticks(rotation=45)
+    
+    # Add count numbers on bars
+    for p in eg.patches:
+        width = p.get_width()
+        height = p.get_height()
+        x, y = p.get_xy()    
+        offset = width * 0.02  # Adjust the offset percentage as needed
+        eg.annotate(format(height, '.0f'), (x + width / 2., y + height), ha='center', va='center', xytext=(0, 5), textcoords='offset points')
+    
+    # Use tight layout
+    plt.tight_layout() 
+    plt.show()
+    
+    
+def race_observed(sample_train):
+    ''' This function creates 3 plots (Bar, Stacked Bar and Heatmap) for Race/Ethnicity (takes the rows or their count table) '''
+    race_observed = observed_table(sample_train, 'Race/Ethnicity')
+    
+    # Filter the DataFrame to keep only the specified race/ethnicity values and drop rows with missing values
+    race_observed_df = race_observed.dropna(subset=['White, non-Hispanic', 'Black, non-Hispanic', 'Hispanic', 'Asian or Pacific Islander', 'American Indian or Alaska Native', 'Other, non-Hispanic', 'Multiracial, non-Hispanic'])
+    
+    # --- Classification Plot 1: Bar Plot ---
+    plt.figure(figsize=(8, 6))
+    race_observed_df.plot(kind='bar', edgecolor='black', ax=plt.gca())
+    plt.xlabel('COPD Status')
+    plt.ylabel('Count')
+    plt.title('COPD Status by Race/Ethnicity')
+    plt.legend(title='Race/Ethnicity', loc='upper right')
+    plt.xticks(rotation=0)
+    plt.tight_layout()
+    plt.show()
+    
+    # --- Classification Plot 2: Stacked Bar Plot ---
+    plt.figure(figsize=(8, 6))
+    race_observed_df.plot(kind='bar', stacked=True, edgecolor='black', ax=plt.gca())
+    plt.xlabel('COPD Status')
+    plt.ylabel('Count')
+    plt.title('COPD Status by Race/Ethnicity')
+    plt.legend(title='Race/Ethnicity', loc='upper right')
+    plt.xticks(rotation=0)
+    plt.tight_layout()
+    plt.show()
+    
+    # --- Classification Plot 3: Heatmap ---
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(race_observed_df, annot=True, fmt='d', cmap='Blues', cbar=True)
+    plt.xlabel('Race/Ethnicity')
+    plt.ylabel('COPD Status')
+    plt.title('COPD Status by Race/Ethnicity (Heatmap)')
+    plt.tight_layout()
+    plt.show()
+
+
+#------- YEAR VS COPD-----        
+def year_graph(sample_train):
+    ''' Time-line of COPD totals per year from the count cube (or the rows it is built from) '''
+    # Count the number of 'No_COPD' and 'Yes_COPD' occurrences for each year in one pass
+    totals_by_year = cube_counts(sample_train, ['Year', 'Yes_COPD']).unstack(fill_value=0)
+    no_COPD_totals_by_year = totals_by_year.get(0, pd.Series(dtype='int64'))
+    yes_COPD_totals_by_year = totals_by_year.get(1, pd.Series(dtype='int64'))
+    
+    # Create a time-line graph for the COPD totals over the years
+    plt.figure(figsize=(10, 6))
+    plt.plot(no_COPD_totals_by_year.index, no_COPD_totals_by_year.values, marker='o', linestyle='-', color='g', label='No COPD')
+    plt.plot(yes_COPD_totals_by_year.index, yes_COPD_totals_by_year.values, marker='o', linestyle='-', color='b', label='Yes COPD')
+    plt.title('Relationship of Year with COPD')
+    plt.xlabel('Year')
+    plt.ylabel('COPD Totals')
+    plt.grid(True)
+    plt.legend()
+    plt.xticks(rotation=45)
+    plt.show()
+
+
+#------- US GEO LOCATION  VS COPD-----
+def state_map_counts(sample_train, coordinates):
+    ''' COPD observations, all observations and COPD rate per State Abbr, joined to its coordinates.
+        Takes the prepared rows or their count cube; coordinates is a state_coordinates table.
+    '''
+    counts = cube_counts(sample_train, ['State Abbr', 'Yes_COPD']).unstack(fill_value=0)
+    states = pd.DataFrame({'copd': counts.get(1, 0), 'observations': counts.sum(axis=1)})
+    states['rate'] = states['copd'] / states['observations']
+    states.index = states.index.astype(str)
+    coordinates = coordinates.set_axis(coordinates.index.astype(str))
+    # national rows such as 'US' have no point and are left off the map
+    return states.join(coordinates, how='inner')
+
+
+def build_map(sample_train, coordinates, path='map_usa.html', static=False):
+    ''' Builds a map with one marker per state, sized by observations and labelled with COPD counts and rate.
+        Saves a folium HTML map, or a static PNG when static=True or folium is not installed (headless CI).
+        Returns the folium map, or the PNG path.
+    '''
+    states = state_map_counts(sample_train, coordinates)
+    if not static:
+        try:
+            import folium
+        except ImportError:
+            static = True
+    if static:
+        png_path = os.path.splitext(path)[0] + '.png'
+        fig, ax = plt.subplots(figsize=(12, 7))
+        points = ax.scatter(states['Longitude'], states['Latitude'], c=states['rate'], cmap='Blues',
+                            s=50 + 450 * states['observations'] / max(states['observations'].max(), 1),
+                            edgecolor='black')
+        for state, row in states.iterrows():
+            ax.annotate(state, (row['Longitude'], row['Latitude']), ha='center', va='center', fontsize=7)
+        fig.colorbar(points, ax=ax, label='COPD rate')
+        ax.set_xlabel('Longitude')
+        ax.set_ylabel('Latitude')
+        ax.set_title('COPD Observations by State')
+        fig.tight_layout()
+        fig.savefig(png_path)
+        plt.close(fig)
+        return png_path
+
+    # Create a folium map centered at the USA
+    map_usa = folium.Map(location=[37.0902, -95.7129], zoom_start=4)
+    largest = max(states['observations'].max(), 1)
+    # itertuples keeps the counts int (iterrows would upcast each row to float)
+    for row in states.itertuples():
+        folium.CircleMarker(
+            location=[row.Latitude, row.Longitude],
+            radius=5 + 20 * row.observations / largest,
+            popup=f"{row.Index} State # of Yes COPD Observations: {row.copd:,} of {row.observations:,} ({row.rate:.1%})",
+            tooltip=row.Index,
+            fill=True,
+            fill_opacity=0.3 + 0.7 * row.rate,
+        ).add_to(map_usa)
+    #saves map HTML image
+    map_usa.save(path)
+    return map_usa
+
+
+def map_graph(sample_train, coordinates=None, path='map_usa.html', static=False):
+    ''' Maps COPD per state from the whole split: one marker per State Abbr instead of one per row.
+        Pass coordinates (state_coordinates of the prepared rows) when sample_train is a count cube.
+    '''
+    if coordinates is None:
+        coordinates = state_coordinates(sample_train)
+    # Display the map
+    return build_map(sample_train, coordinates, path, static)
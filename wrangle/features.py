@@ -0,0 +1,139 @@
+''' Feature matrices for the classifiers: the model inputs converted once into the float32 C-contiguous
+    layout (or CSR) that sklearn's trees and LogisticRegression use as is, with the column schema recorded.
+    Pickled matrices (e.g. on their way to run_models' worker processes) bit-pack the 0/1 columns.
+'''
+import numpy as np
+
+# Bump when the schema layout changes
+FEATURE_SCHEMA_VERSION = 1
+
+
+class FeatureMatrix:
+    ''' X (float32 C-contiguous ndarray, or CSR matrix), y (uint8, optional) and the schema of X's columns.
+        Pass it wherever a feature frame goes (train_models, run_models, search_models); the estimators
+        then get X without a DataFrame -> ndarray conversion on every fit/predict.
+    '''
+    def __init__(self, X, y, schema):
+        self.X = X
+        self.y = y
+        self.schema = schema
+
+    def __repr__(self):
+        return (f"FeatureMatrix({self.shape[0]:,} x {self.shape[1]}, {self.schema['layout']}, "
+                f"{self.nbytes / 1e6:,.1f} MB)")
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def shape(self):
+        return self.X.shape
+
+    @property
+    def columns(self):
+        return [col['name'] for col in self.schema['columns']]
+
+    @property
+    def binary(self):
+        ''' Mask of the 0/1 columns '''
+        return np.array([col['kind'] == 'binary' for col in self.schema['columns']], dtype=bool)
+
+    @property
+    def nbytes(self):
+        if self.schema['layout'] == 'sparse':
+            return self.X.data.nbytes + self.X.indices.nbytes + self.X.indptr.nbytes
+        return self.X.nbytes
+
+    def take(self, rows):
+        ''' The rows at the given positions, as a new FeatureMatrix with the same schema '''
+        return FeatureMatrix(self.X[rows], None if self.y is None else self.y[rows], self.schema)
+
+    def __reduce__(self):
+        binary = self.binary
+        flags = self.X[:, binary] if self.schema['layout'] == 'dense' else None
+        # packing would turn any other value into 1, so a matrix whose 0/1 columns hold one pickles as is
+        if flags is None or not ((flags == 0) | (flags == 1)).all():
+            return FeatureMatrix, (self.X, self.y, self.schema)
+        # numeric columns as float32, the 0/1 columns 8 to a byte
+        bits = np.packbits(flags.astype(bool), axis=1)
+        return _unpack_matrix, (np.ascontiguousarray(self.X[:, ~binary]), bits, self.y, self.schema)
+
+
+def _unpack_matrix(numeric, bits, y, schema):
+    ''' Rebuilds a dense FeatureMatrix from its pickled, bit-packed form '''
+    binary = np.array([col['kind'] == 'binary' for col in schema['columns']], dtype=bool)
+    X = np.empty((len(numeric), len(binary)), dtype=np.float32)
+    X[:, ~binary] = numeric
+    X[:, binary] = np.unpackbits(bits, axis=1, count=int(binary.sum()))
+    return FeatureMatrix(X, y, schema)
+
+
+def model_input(X):
+    ''' What an estimator is fitted on: the matrix of a FeatureMatrix, anything else as is '''
+    return X.X if isinstance(X, FeatureMatrix) else X
+
+
+def build_feature_matrix(X, y=None, rows=None, columns=None, layout='dense', schema=None):
+    ''' Converts the feature columns of a frame into a FeatureMatrix in one pass, column by column.
+        y is a Series/array or the name of a column of X; rows gathers only those positions (so an
+        IndexSplit never materializes its split frame). layout='dense' gives a float32 C-contiguous
+        array, 'sparse' a float32 CSR matrix. Pass the training matrix's schema when building the
+        validate/test (or scoring) matrices: the columns then come out in the same order, and a missing
+        column, or a value other than 0/1 in a column the schema records as binary, raises a ValueError.
+    '''
+    if schema is not None:
+        columns = [col['name'] for col in schema['columns']]
+        missing = [col for col in columns if col not in X.columns]
+        if missing:
+            raise ValueError(f'Columns {missing} of the feature schema are not in the frame')
+        layout = schema['layout']
+    elif columns is None:
+        target = y if isinstance(y, str) else None
+        columns = [col for col in X.columns if col != target]
+    if isinstance(y, str):
+        y = X[y].to_numpy()
+    elif y is not None:
+        y = np.asarray(y)
+    if y is not None:
+        y = (y if rows is None else y[rows]).astype(np.uint8)
+
+    n = len(X) if rows is None else len(rows)
+    dense = np.empty((n, len(columns)), dtype=np.float32) if layout == 'dense' else None
+    sparse_parts, kinds = [], []
+    for j, col in enumerate(columns):
+        values = X[col].to_numpy()
+        values = values if rows is None else values[rows]
+        if schema is None:
+            kinds.append({'name': col, 'kind': 'binary' if values.dtype.kind in 'biu' and np.isin(values, (0, 1)).all()
+                          else 'numeric', 'source_dtype': str(X[col].dtype)})
+        elif schema['columns'][j]['kind'] == 'binary' and not np.isin(values, (0, 1)).all():
+            raise ValueError(f'Column {col!r} is binary in the feature schema but holds values other than 0/1')
+        if dense is not None:
+            dense[:, j] = values
+        else:
+            nonzero = np.flatnonzero(values)
+            sparse_parts.append((values[nonzero].astype(np.float32), nonzero, np.full(len(nonzero), j)))
+
+    if schema is None:
+        schema = {'version': FEATURE_SCHEMA_VERSION, 'layout': layout, 'dtype': 'float32', 'columns': kinds}
+    if dense is not None:
+        return FeatureMatrix(dense, y, schema)
+
+    import scipy.sparse as sparse_matrix
+    if sparse_parts:
+        data, row_index, col_index = (np.concatenate(part) for part in zip(*sparse_parts))
+    else:
+        data = row_index = col_index = np.empty(0)
+    X_sparse = sparse_matrix.csr_matrix((data, (row_index, col_index)), shape=(n, len(columns)), dtype=np.float32)
+    return FeatureMatrix(X_sparse, y, schema)
+
+
+def X_y_matrices(sample_train, sample_validate, sample_test, layout='dense', target='Yes_COPD'):
+    ''' The X_y_split features of each split as FeatureMatrix objects sharing the training schema.
+        train_models(train, train.y, validate, validate.y, test, test.y) fits on them directly.
+    '''
+    columns = [col for col in sample_train.select_dtypes(include='number').columns if col != target]
+    train = build_feature_matrix(sample_train, target, columns=columns, layout=layout)
+    validate = build_feature_matrix(sample_validate, target, schema=train.schema)
+    test = build_feature_matrix(sample_test, target, schema=train.schema)
+    return train, validate, test
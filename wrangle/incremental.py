@@ -0,0 +1,228 @@
+''' Incremental preparation: the cleaned COPD rows stored in Year (optionally Year/State) partitions.
+    Each partition records a content hash of its source rows, so a new CDI release only re-cleans
+    the partitions whose rows changed; the cube and count tables are summed from per-partition aggregates.
+'''
+import datetime
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .instrument import Stage, traced
+from .prepare import (CACHE_VERSION, CDI_CSV, CDI_DTYPES, CONTINGENCY_COLUMNS, build_cube,
+                      clean_copd, concat_chunks, read_cdi_chunks, write_cache)
+
+# Partitions are written here, one directory per partition plus manifest.json
+PARTITION_DIR = 'COPD_partitions'
+
+# Prepared column -> (raw CDI column, directory label) for the supported partition keys
+PARTITION_KEYS = {'Year': ('YearStart', 'Year'), 'State Abbr': ('LocationAbbr', 'State')}
+
+
+def partition_name(by, values):
+    ''' Directory of one partition, e.g. 'Year=2019' or 'Year=2019/State=AL' '''
+    return '/'.join(f'{PARTITION_KEYS[col][1]}={value}' for col, value in zip(by, values))
+
+
+def partition_hashes(filename=CDI_CSV, by=('Year',), chunksize=500000):
+    ''' One pass over the csv: {partition: {'hash', 'source_rows'}} for the Topic-filtered rows prep keeps.
+        The hash combines a hash of every row's CDI_DTYPES columns (all clean_copd reads) by count, sum and
+        xor, so it changes when the partition's rows change but not when rows move around in the file.
+    '''
+    raw_keys = [PARTITION_KEYS[col][0] for col in by]
+    totals = {}
+    for chunk in read_cdi_chunks(filename, chunksize):
+        row_hashes = pd.util.hash_pandas_object(chunk[list(CDI_DTYPES)], index=False).to_numpy()
+        codes, keys = pd.MultiIndex.from_frame(chunk[raw_keys]).factorize()
+        counts = np.bincount(codes, minlength=len(keys))
+        sums = np.zeros(len(keys), dtype=np.uint64)
+        xors = np.zeros(len(keys), dtype=np.uint64)
+        # uint64 sums wrap around, which is what an order-independent checksum wants
+        np.add.at(sums, codes, row_hashes)
+        np.bitwise_xor.at(xors, codes, row_hashes)
+        for key, count, total, xor in zip(keys, counts, sums, xors):
+            running = totals.setdefault(partition_name(by, key), [0, 0, 0])
+            running[0] += int(count)
+            running[1] = (running[1] + int(total)) % 2**64
+            running[2] ^= int(xor)
+    return {name: {'hash': hashlib.sha256(f'{CACHE_VERSION}:{count}:{total}:{xor}'.encode()).hexdigest()[:16],
+                   'source_rows': count}
+            for name, (count, total, xor) in sorted(totals.items())}
+
+
+def read_partition_rows(filename, by, source_rows, chunksize=500000):
+    ''' Yields (partition, frame) with the raw Topic-filtered rows of the partitions in source_rows
+        ({partition: row count}, as partition_hashes reports them), read in one pass. A partition is yielded
+        as soon as its last row has been read, so only the partitions still being read are held in memory.
+    '''
+    raw_keys = [PARTITION_KEYS[col][0] for col in by]
+    parts = {name: [] for name in source_rows}
+    seen = dict.fromkeys(source_rows, 0)
+    for chunk in read_cdi_chunks(filename, chunksize):
+        codes, keys = pd.MultiIndex.from_frame(chunk[raw_keys]).factorize()
+        for code, key in enumerate(keys):
+            name = partition_name(by, key)
+            if name in parts:
+                rows = chunk[codes == code]
+                parts[name].append(rows)
+                seen[name] += len(rows)
+                if seen[name] >= source_rows[name]:
+                    yield name, concat_chunks(parts.pop(name))
+    # partitions that came up short of their row count (the csv changed since it was hashed)
+    for name, chunks in parts.items():
+        yield name, concat_chunks(chunks)
+
+
+def partition_batches(source_rows, batch_rows):
+    ''' Splits {partition: row count} into batches of at most batch_rows rows; a bigger partition is a batch
+        of its own. batch_rows=None gives one batch.
+    '''
+    batches, batch, total = [], {}, 0
+    for name, rows in source_rows.items():
+        if batch and batch_rows is not None and total + rows > batch_rows:
+            batches.append(batch)
+            batch, total = {}, 0
+        batch[name] = rows
+        total += rows
+    return batches + [batch] if batch else batches
+
+
+def partition_tables(df_sample, columns=CONTINGENCY_COLUMNS, target='Yes_COPD'):
+    ''' Long-format Yes_COPD x column counts of one partition: column, value, Yes_COPD, count '''
+    tables = []
+    for col in columns:
+        counts = df_sample.groupby([col, target], observed=True).size().rename('count').reset_index()
+        tables.append(pd.DataFrame({'column': col, 'value': counts[col].astype(str),
+                                    target: counts[target], 'count': counts['count']}))
+    return pd.concat(tables, ignore_index=True)
+
+
+def read_manifest(out_dir=PARTITION_DIR):
+    ''' The partition manifest, or an empty one when out_dir has not been built yet '''
+    path = os.path.join(out_dir, 'manifest.json')
+    if not os.path.isfile(path):
+        return {'partitions': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_partition(df_sample, path):
+    ''' Writes one cleaned partition with its cube and count tables next to it '''
+    os.makedirs(path, exist_ok=True)
+    write_cache(df_sample, os.path.join(path, 'rows.parquet'))
+    build_cube(df_sample).to_parquet(os.path.join(path, 'cube.parquet'))
+    partition_tables(df_sample).to_parquet(os.path.join(path, 'tables.parquet'))
+
+
+@traced()
+def prep_copd_incremental(filename=CDI_CSV, out_dir=PARTITION_DIR, by=('Year',), chunksize=500000, force=False,
+                          batch_rows=2000000):
+    ''' Prepares every row of the CDI csv into partitions under out_dir and only re-cleans what changed.
+        A first pass hashes each partition's source rows; partitions whose hash, partition layout or
+        CACHE_VERSION differ from the manifest (or that are missing) are read in a second pass, cleaned
+        with clean_copd and rewritten, each as soon as its rows are read. The stale partitions are read in
+        passes of at most batch_rows source rows (None reads them all in one pass), which bounds the raw
+        rows held at once. Partitions gone from the source are deleted. The combined cube
+        and count tables are then summed from the per-partition aggregates.
+        Unlike prep_copd this keeps every row (no sampling). Returns the partition summary.
+    '''
+    by = list(by)
+    with Stage('hash_partitions') as stage:
+        hashes = partition_hashes(filename, by, chunksize)
+        stage.rows_out = len(hashes)
+    manifest = read_manifest(out_dir)
+    same_layout = manifest.get('by') == by and manifest.get('version') == CACHE_VERSION
+    old = manifest['partitions'] if same_layout and not force else {}
+
+    stale = [name for name, part in hashes.items()
+             if old.get(name, {}).get('hash') != part['hash'] or not os.path.isdir(os.path.join(out_dir, name))]
+    removed = [name for name in manifest['partitions'] if name not in hashes]
+
+    # removed first: after a layout change a new partition may live inside an old partition's directory
+    for name in removed:
+        shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+
+    partitions = {name: old[name] for name in hashes if name not in stale}
+    if stale:
+        with Stage('rebuild_partitions', rows_in=sum(hashes[name]['source_rows'] for name in stale)) as stage:
+            for batch in partition_batches({name: hashes[name]['source_rows'] for name in stale}, batch_rows):
+                for name, raw in read_partition_rows(filename, by, batch, chunksize):
+                    df_sample = clean_copd(raw)
+                    write_partition(df_sample, os.path.join(out_dir, name))
+                    partitions[name] = {**hashes[name], 'rows': len(df_sample),
+                                        'updated_at': datetime.datetime.now().isoformat(timespec='seconds')}
+            stage.rows_out = sum(partitions[name]['rows'] for name in stale)
+
+    manifest = {'version': CACHE_VERSION, 'source': os.path.abspath(filename), 'by': by,
+                'partitions': dict(sorted(partitions.items()))}
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # combined aggregates: O(cells) sums over the stored partition aggregates, no row is re-read
+    with Stage('combine_aggregates'):
+        cube = load_partition_cube(out_dir)
+        cube.to_csv(os.path.join(out_dir, 'cube.csv'), index=False)
+        combine_partition_tables(out_dir).to_parquet(os.path.join(out_dir, 'tables.parquet'))
+
+    summary = {'rebuilt': stale, 'unchanged': [name for name in hashes if name not in stale], 'removed': removed,
+               'rows': sum(part['rows'] for part in partitions.values())}
+    print(f"Partitions: {len(summary['rebuilt'])} rebuilt, {len(summary['unchanged'])} unchanged, "
+          f"{len(removed)} removed; {summary['rows']:,} prepared rows in {out_dir}")
+    return summary
+
+
+def partition_paths(out_dir=PARTITION_DIR, filename='rows.parquet', **filters):
+    ''' Paths of one file in every partition, keeping partitions whose key is in filters[column] '''
+    manifest = read_manifest(out_dir)
+    paths = []
+    for name in manifest['partitions']:
+        values = dict(zip(manifest['by'], (part.split('=', 1)[1] for part in name.split('/'))))
+        if all(str(values.get(col)) in {str(value) for value in wanted} for col, wanted in filters.items()):
+            paths.append(os.path.join(out_dir, name, filename))
+    return paths
+
+
+def load_partitions(out_dir=PARTITION_DIR, **filters):
+    ''' The prepared rows of every partition (or of those matching filters, e.g. Year=[2019, 2020]) '''
+    # partitions emptied by dropna (e.g. the national rows without a point) would spoil the categoricals
+    frames = [frame for frame in map(pd.read_parquet, partition_paths(out_dir, **filters)) if len(frame)]
+    return concat_chunks(frames) if frames else pd.DataFrame()
+
+
+def load_partition_cube(out_dir=PARTITION_DIR, **filters):
+    ''' The count cube summed over the partitions' cubes '''
+    cubes = [cube for cube in map(pd.read_parquet, partition_paths(out_dir, 'cube.parquet', **filters)) if len(cube)]
+    if not cubes:
+        return pd.DataFrame(columns=['Year', 'State Abbr', 'Demographics', 'Yes_COPD', 'count'])
+    cube = concat_chunks(cubes)
+    keys = [col for col in cube.columns if col != 'count']
+    return cube.groupby(keys, observed=True)['count'].sum().reset_index()
+
+
+def combine_partition_tables(out_dir=PARTITION_DIR, **filters):
+    ''' The long-format count tables summed over the partitions '''
+    tables = [pd.read_parquet(path) for path in partition_paths(out_dir, 'tables.parquet', **filters)]
+    if not tables:
+        return pd.DataFrame({'column': pd.Series(dtype=object), 'value': pd.Series(dtype=object),
+                             'Yes_COPD': pd.Series(dtype='int64'), 'count': pd.Series(dtype='int64')})
+    tables = pd.concat(tables, ignore_index=True)
+    return tables.groupby(['column', 'value', 'Yes_COPD'])['count'].sum().reset_index()
+
+
+def load_partition_tables(out_dir=PARTITION_DIR, columns=CONTINGENCY_COLUMNS, target='Yes_COPD'):
+    ''' Yes_COPD x column count tables of all prepared rows, in the layout contingency_tables returns '''
+    tables = pd.read_parquet(os.path.join(out_dir, 'tables.parquet'))
+    result = {}
+    for col in columns:
+        long = tables[tables['column'] == col]
+        table = long.pivot_table(index='Yes_COPD', columns='value', values='count', aggfunc='sum', fill_value=0)
+        if col in ('Year', 'Yes_female'):
+            table.columns = table.columns.astype(int)
+            table = table.sort_index(axis=1)
+        table.index.name, table.columns.name = target, col
+        result[col] = table
+    return result
@@ -0,0 +1,133 @@
+''' Saving, loading and batch scoring of fitted models '''
+import datetime
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .features import FeatureMatrix, build_feature_matrix
+from .prepare import DEMOGRAPHIC_DUMMIES, FEATURE_COLUMNS, TOPICS_TO_REMOVE, encode_features
+
+
+#---------PERSIST & PREDICT-------------------
+# Bump when the saved model layout changes; load_model refuses other versions
+MODEL_FORMAT_VERSION = 2
+
+
+def save_model(model, path, features=FEATURE_COLUMNS, mapping=DEMOGRAPHIC_DUMMIES, schema=None):
+    ''' Saves a fitted model behind a header recording the format version and feature schema.
+        A model fitted on a DataFrame must have been fitted on exactly these feature columns. For a model
+        fitted on a FeatureMatrix pass its schema (or the matrix itself): it must list the same columns, and
+        predict_batch then builds the scoring matrix from it.
+    '''
+    import sklearn
+    fitted_on = getattr(model, 'feature_names_in_', None)
+    if fitted_on is not None and list(fitted_on) != list(features):
+        raise ValueError(f'The model was fitted on {list(fitted_on)}, not the features {list(features)}')
+    if isinstance(schema, FeatureMatrix):
+        schema = schema.schema
+    if schema is not None and [col['name'] for col in schema['columns']] != list(features):
+        raise ValueError(f"The feature schema lists {[col['name'] for col in schema['columns']]}, "
+                         f'not the features {list(features)}')
+    header = {'format_version': MODEL_FORMAT_VERSION,
+              'model': type(model).__name__,
+              'features': list(features),
+              'dummies': dict(mapping),
+              'feature_names': fitted_on is not None,
+              'schema': schema,
+              'sklearn_version': sklearn.__version__,
+              'saved_at': datetime.datetime.now().isoformat(timespec='seconds')}
+    joblib.dump({'header': header, 'model': model}, path)
+    return header
+
+
+def load_model(path):
+    ''' Loads a model saved by save_model and returns (model, header) '''
+    payload = joblib.load(path)
+    header = payload.get('header', {}) if isinstance(payload, dict) else {}
+    if header.get('format_version') != MODEL_FORMAT_VERSION:
+        raise ValueError(f'{path} has model format version {header.get("format_version")}, '
+                         f'expected {MODEL_FORMAT_VERSION}; re-save the model with save_model')
+    if header['features'] != FEATURE_COLUMNS[:3] + list(header['dummies']):
+        raise ValueError(f'{path} has a feature schema encode_features cannot produce: {header["features"]}')
+    return payload['model'], header
+
+
+def scoring_input(features, header):
+    ''' What a saved model scores: the feature frame for a model fitted on one, otherwise the matrix built
+        from the saved FeatureMatrix schema (which checks the columns), or the float32 feature array
+    '''
+    if header['feature_names']:
+        return features
+    if header['schema'] is not None:
+        return build_feature_matrix(features, schema=header['schema']).X
+    return features[header['features']].to_numpy(np.float32)
+
+
+def read_input_chunks(input_path, chunksize):
+    ''' Yields raw rows from a CDI-shaped csv or parquet file, chunk by chunk '''
+    if input_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        # Topic is read when the file has it, so predict_batch can drop the Topics prep_copd drops
+        columns = ['Topic', 'YearStart', 'Stratification1', 'GeoLocation']
+        yield from pd.read_csv(input_path, usecols=lambda col: col in columns,
+                               dtype={'Topic': 'category', 'YearStart': 'int16', 'Stratification1': 'category',
+                                      'GeoLocation': 'category'}, chunksize=chunksize)
+
+
+def predict_batch(model_path, input_path, output_path, chunksize=500000):
+    ''' Scores a CDI-shaped csv/parquet file chunk by chunk with a saved model and streams the predictions
+        and COPD probabilities to output_path (csv, or parquet by extension), so memory stays bounded
+        by chunksize. Rows of the TOPICS_TO_REMOVE Topics and rows without usable coordinates are skipped,
+        as prep_copd drops them (a file without a Topic column is scored in full); when no row
+        is scored output_path still gets the header (or an empty parquet file), never an old run's output.
+        Prints and returns the throughput.
+    '''
+    model, header = load_model(model_path)
+    positive = list(model.classes_).index(1)
+    start = time.perf_counter()
+    rows_read = rows_scored = 0
+    writer = None
+    try:
+        for chunk in read_input_chunks(input_path, chunksize):
+            chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+            rows_read += len(chunk)
+            if 'Topic' in chunk.columns:
+                chunk = chunk[~chunk['Topic'].isin(TOPICS_TO_REMOVE)]
+            features = encode_features(chunk, header['dummies']).dropna()
+            if features.empty:
+                continue
+            probabilities = model.predict_proba(scoring_input(features, header))
+            scored = pd.DataFrame({'row': features.index.to_numpy(),
+                                   'prediction': model.classes_[probabilities.argmax(axis=1)],
+                                   'probability': probabilities[:, positive]})
+            if output_path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(scored, preserve_index=False)
+                writer = writer or pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                scored.to_csv(output_path, mode='w' if rows_scored == 0 else 'a', header=rows_scored == 0, index=False)
+            rows_scored += len(scored)
+        if rows_scored == 0:
+            empty = pd.DataFrame({'row': pd.Series(dtype='int64'), 'prediction': model.classes_[:0],
+                                  'probability': pd.Series(dtype='float64')})
+            if output_path.endswith('.parquet'):
+                empty.to_parquet(output_path, index=False)
+            else:
+                empty.to_csv(output_path, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {'rows_read': rows_read, 'rows_scored': rows_scored, 'seconds': elapsed,
+               'rows_per_minute': rows_read / max(elapsed, 1e-9) * 60}
+    print(f"Scored {rows_scored:,} of {rows_read:,} rows in {elapsed:.2f}s "
+          f"({summary['rows_per_minute']:,.0f} rows/minute)")
+    return summary
@@ -0,0 +1,206 @@
+''' Stage-level instrumentation: wall time, CPU time, peak memory and rows in/out of each pipeline stage.
+    Off by default; a disabled Stage costs one global lookup. Turn it on around a run with
+    `with tracing('trace.json'):` and open the Chrome trace in chrome://tracing or Perfetto.
+'''
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+# State of the running trace; None while instrumentation is off
+_TRACE = None
+
+
+def enable_tracing(memory=True, profile_dir=None, profile_stages=None):
+    ''' Starts recording stages. memory=True tracks peak memory with tracemalloc (slows allocation-heavy
+        code down, so turn it off for timing-only runs). profile_dir writes a cProfile dump per stage,
+        restricted to the names in profile_stages when given; nested stages are only profiled when no
+        enclosing stage is (one profiler can run at a time).
+    '''
+    global _TRACE
+    started_tracemalloc = memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    _TRACE = {'records': [], 'stack': [], 'origin': time.perf_counter(), 'memory': memory,
+              'started_tracemalloc': started_tracemalloc, 'profile_dir': profile_dir,
+              'profile_stages': set(profile_stages) if profile_stages else None, 'profiling': False}
+
+
+def disable_tracing():
+    ''' Stops recording and returns the stage records '''
+    global _TRACE
+    if _TRACE is None:
+        return []
+    trace, _TRACE = _TRACE, None
+    if trace['started_tracemalloc']:
+        tracemalloc.stop()
+    return trace['records']
+
+
+def tracing_enabled():
+    return _TRACE is not None
+
+
+def count_rows(value):
+    ''' Rows of a frame/array, or a list of them for a tuple of frames; None for anything else '''
+    if isinstance(value, (tuple, list)):
+        return [count_rows(item) for item in value]
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+class Stage:
+    ''' Times one stage of the pipeline when tracing is on:
+
+            with Stage('parse_geo', rows_in=len(df)) as stage:
+                ...
+                stage.rows_out = len(coordinates)
+
+        Stages nest; each record keeps its parent's name and depth.
+    '''
+    __slots__ = ('name', 'rows_in', 'rows_out', 'meta', '_start', '_cpu', '_memory', '_peak', '_profiler')
+
+    def __init__(self, name, rows_in=None, **meta):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.meta = meta
+        self._start = None
+
+    def __enter__(self):
+        if _TRACE is None:
+            return self
+        stack = _TRACE['stack']
+        if _TRACE['memory'] and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # tracemalloc has a single peak: hand it to the enclosing stage before resetting it for this one
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._memory, self._peak = current, current
+        else:
+            self._memory = self._peak = None
+        self._profiler = None
+        wanted = _TRACE['profile_stages']
+        if _TRACE['profile_dir'] and not _TRACE['profiling'] and (wanted is None or self.name in wanted):
+            import cProfile
+            self._profiler = cProfile.Profile()
+            _TRACE['profiling'] = True
+        stack.append(self)
+        self._cpu = time.process_time()
+        self._start = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if _TRACE is None or self._start is None:
+            return False
+        if self._profiler is not None:
+            self._profiler.disable()
+        wall = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu
+        stack = _TRACE['stack']
+        stack.pop()
+        record = {'name': self.name, 'parent': stack[-1].name if stack else None, 'depth': len(stack),
+                  'start': self._start - _TRACE['origin'], 'wall': wall, 'cpu': cpu,
+                  'rows_in': self.rows_in, 'rows_out': self.rows_out, 'error': exc_type.__name__ if exc_type else None}
+        if self._peak is not None:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            if stack and stack[-1]._peak is not None:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+            record['peak_mb'] = self._peak / 1e6
+            record['peak_added_mb'] = (self._peak - self._memory) / 1e6
+        if self._profiler is not None:
+            _TRACE['profiling'] = False
+            path = os.path.join(_TRACE['profile_dir'], f"{len(_TRACE['records']):03d}-{self.name}.prof")
+            self._profiler.dump_stats(path)
+            record['profile'] = path
+        record.update(self.meta)
+        _TRACE['records'].append(record)
+        return False
+
+
+def traced(name=None):
+    ''' Decorator recording a call as a Stage, with rows in from the first argument and rows out from the result '''
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _TRACE is None:
+                return func(*args, **kwargs)
+            with Stage(stage_name, rows_in=count_rows(args[0]) if args else None) as stage:
+                result = func(*args, **kwargs)
+                stage.rows_out = count_rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def record_stage(name, wall, start=None, rows_in=None, rows_out=None, **meta):
+    ''' Adds a stage measured elsewhere (e.g. a fit inside a worker process) under the open stage.
+        start is its time.perf_counter() start; by default the stage is taken to end now.
+    '''
+    if _TRACE is None:
+        return
+    stack = _TRACE['stack']
+    start = time.perf_counter() - wall if start is None else start
+    _TRACE['records'].append({'name': name, 'parent': stack[-1].name if stack else None, 'depth': len(stack),
+                              'start': start - _TRACE['origin'], 'wall': wall, 'cpu': None, 'rows_in': rows_in,
+                              'rows_out': rows_out, 'error': None, **meta})
+
+
+def chrome_trace(records):
+    ''' Records as Chrome trace events (complete 'X' events in microseconds) '''
+    events = []
+    for record in records:
+        args = {key: value for key, value in record.items() if key not in ('name', 'start', 'wall')}
+        events.append({'name': record['name'], 'cat': 'wrangle', 'ph': 'X', 'pid': os.getpid(),
+                       # stages measured in workers get their own row so they do not overlap the parent's
+                       'tid': record.get('worker', 0), 'ts': record['start'] * 1e6, 'dur': record['wall'] * 1e6,
+                       'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_trace(path, records, fmt='chrome'):
+    ''' Writes records as a Chrome trace (fmt='chrome') or a plain JSON list of records (fmt='json') '''
+    payload = chrome_trace(records) if fmt == 'chrome' else records
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=1, default=str)
+    return path
+
+
+def trace_table(records):
+    ''' Records as a DataFrame in start order, stage names indented by depth '''
+    import pandas as pd
+    table = pd.DataFrame(records)
+    if table.empty:
+        return table
+    table = table.sort_values('start').reset_index(drop=True)
+    table['stage'] = ['  ' * depth + name for depth, name in zip(table['depth'], table['name'])]
+    columns = ['stage', 'wall', 'cpu', 'peak_mb', 'rows_in', 'rows_out']
+    return table[[col for col in columns if col in table.columns]]
+
+
+@contextlib.contextmanager
+def tracing(path=None, fmt='chrome', memory=True, profile_dir=None, profile_stages=None, verbose=True):
+    ''' Records every stage run inside the block. Writes the trace to path when given and prints the
+        stage table when verbose. Yields the list the records are appended to.
+    '''
+    enable_tracing(memory, profile_dir, profile_stages)
+    records = _TRACE['records']
+    try:
+        yield records
+    finally:
+        disable_tracing()
+        if path:
+            write_trace(path, records, fmt)
+        if verbose and records:
+            table = trace_table(records).round(3)
+            width = table['stage'].str.len().max()
+            print(table.to_string(index=False, formatters={'stage': f'{{:<{width}}}'.format}))
@@ -0,0 +1,421 @@
+''' Model registry, parallel training, hyperparameter search and out-of-core training '''
+import hashlib
+import inspect
+import math
+import os
+import json
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import issparse
+from sklearn.model_selection import ParameterGrid
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.frozen import FrozenEstimator
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import make_pipeline
+from sklearn.metrics import accuracy_score, brier_score_loss, precision_recall_fscore_support
+from threadpoolctl import threadpool_limits
+
+from .features import FeatureMatrix, model_input
+from .instrument import record_stage, traced
+from .prepare import CDI_CSV, DEMOGRAPHIC_DUMMIES, encode_features, read_cdi_chunks
+
+
+#---------TRAIN MODELS-------------------
+# Model registry: name -> (estimator class, hyperparameters)
+MODELS = {
+    'Decision Tree': (DecisionTreeClassifier, {'max_depth': 3, 'random_state': 42}),
+    'Logistic Regression': (LogisticRegression, {'C': 1, 'random_state': 42}),
+    'Random Forest': (RandomForestClassifier, {'bootstrap': True,
+                                               'class_weight': None,
+                                               'criterion': 'gini',
+                                               'min_samples_leaf': 1,
+                                               'n_estimators': 100,
+                                               'max_depth': 10,
+                                               'random_state': 42}),
+    # histogram-binned boosting; early-stops on the validate split when run_models is given one
+    'Gradient Boosting': (HistGradientBoostingClassifier, {'learning_rate': 0.1,
+                                                           'max_iter': 300,
+                                                           'max_leaf_nodes': 31,
+                                                           'early_stopping': True,
+                                                           'n_iter_no_change': 10,
+                                                           'random_state': 42}),
+}
+
+# Estimators that spread one fit over threads: run_models hands them the cores the single-threaded
+# models leave free, as n_jobs (the forest) or as an OpenMP thread cap (gradient boosting)
+THREADED_ESTIMATORS = (RandomForestClassifier, HistGradientBoostingClassifier)
+
+# Probability calibration methods for run_models/train_models' calibrate
+CALIBRATION_METHODS = ('isotonic', 'sigmoid')
+
+
+def estimator_input(model, X):
+    ''' model_input(X), densified when X is sparse and the estimator only takes dense input (gradient boosting) '''
+    X = model_input(X)
+    if issparse(X) and not model.__sklearn_tags__().input_tags.sparse:
+        return X.toarray()
+    return X
+
+
+def fit_model(estimator, params, X_train, y_train, validation=None):
+    ''' Fits one model. Early-stopping estimators whose fit takes X_val/y_val (gradient boosting)
+        stop on validation=(X, y) instead of holding out part of the training rows.
+    '''
+    model = estimator(**params)
+    fit_params = {}
+    if validation is not None and params.get('early_stopping') and 'X_val' in inspect.signature(model.fit).parameters:
+        fit_params = {'X_val': estimator_input(model, validation[0]), 'y_val': validation[1]}
+    model.fit(estimator_input(model, X_train), y_train, **fit_params)
+    return model
+
+
+def calibrate_model(model, X, y, method='isotonic'):
+    ''' The fitted model with its predict_proba recalibrated on (X, y); the model itself is not refitted '''
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f'calibrate must be one of {CALIBRATION_METHODS}, got {method!r}')
+    return CalibratedClassifierCV(FrozenEstimator(model), method=method).fit(estimator_input(model, X), y)
+
+
+def fit_and_predict(estimator, params, X_train, y_train, split_X, validation=None, calibrate=None, threads=None):
+    ''' Fits one registry model and predicts every split once (runs in a worker process).
+        FeatureMatrix inputs are fitted and predicted from their matrix directly. validation=(X, y)
+        is used for early stopping and, with calibrate, to calibrate the probabilities; the calibration
+        time counts as fit time. Predictions are the most probable class, as predict_batch scores.
+        threads caps the worker's OpenMP/BLAS thread pools, so parallel workers do not oversubscribe the cores.
+    '''
+    with threadpool_limits(limits=threads):
+        start = time.perf_counter()
+        model = fit_model(estimator, params, X_train, y_train, validation)
+        base = model
+        if calibrate:
+            model = calibrate_model(model, *validation, method=calibrate)
+        fit_time = time.perf_counter() - start
+
+        predictions, probabilities, predict_times = {}, {}, {}
+        positive = list(model.classes_).index(1)
+        for split, X in split_X.items():
+            start = time.perf_counter()
+            proba = model.predict_proba(estimator_input(base, X))
+            predictions[split] = model.classes_[proba.argmax(axis=1)]
+            predict_times[split] = time.perf_counter() - start
+            probabilities[split] = proba[:, positive]
+    return model, fit_time, predictions, probabilities, predict_times
+
+
+def score_predictions(name, split, y, y_pred, fit_time, predict_time, model_size, y_proba=None):
+    ''' One row of the results table. With COPD probabilities it adds the Brier score and the predicted
+        prevalence (mean probability) next to the observed one.
+    '''
+    precision, recall, f1, _ = precision_recall_fscore_support(y, y_pred, average='binary', zero_division=0)
+    row = {'model': name, 'split': split, 'accuracy': accuracy_score(y, y_pred),
+           'precision': precision, 'recall': recall, 'f1': f1,
+           'fit_time': fit_time, 'predict_time': predict_time, 'model_size_mb': model_size / 1e6}
+    if y_proba is not None:
+        row.update({'brier': brier_score_loss(y, y_proba), 'predicted_prevalence': float(np.mean(y_proba)),
+                    'observed_prevalence': float(np.mean(y))})
+    return row
+
+
+@traced()
+def run_models(X_train, y_train, splits, models=MODELS, n_jobs=None, calibrate=None):
+    ''' Fits the registry models at the same time in a process pool and scores each split once.
+        splits maps split name -> (X, y); every worker is capped at its share of n_jobs threads: one
+        for the single-threaded models, the rest split between the THREADED_ESTIMATORS. Gradient boosting early-stops on the 'validate' split.
+        calibrate='isotonic' (or 'sigmoid') recalibrates every model's probabilities on 'validate',
+        so its validate scores are no longer held out; judge calibrated models on 'test'.
+        Returns the results table and the fitted models.
+    '''
+    n_jobs = n_jobs or os.cpu_count()
+    split_X = {split: X for split, (X, y) in splits.items()}
+    validation = splits.get('validate')
+    if calibrate and validation is None:
+        raise ValueError("calibrate needs a 'validate' split to calibrate on")
+    pool_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(len(models), n_jobs))) as pool:
+        threaded = [name for name, (estimator, _) in models.items() if issubclass(estimator, THREADED_ESTIMATORS)]
+        spare = max(1, n_jobs - len(models) + len(threaded))
+        futures = {}
+        for name, (estimator, params) in models.items():
+            threads = max(1, spare // len(threaded)) if name in threaded else 1
+            if name in threaded and 'n_jobs' in estimator().get_params() and 'n_jobs' not in params:
+                params = {**params, 'n_jobs': threads}
+            futures[name] = pool.submit(fit_and_predict, estimator, params, X_train, y_train, split_X,
+                                        validation, calibrate, threads)
+
+        rows, fitted = [], {}
+        for worker, (name, future) in enumerate(futures.items(), start=1):
+            model, fit_time, predictions, probabilities, predict_times = future.result()
+            fitted[name] = model
+            # fits run in worker processes, so their stages are recorded from the times they report,
+            # laid out back to back from when the pool started
+            record_stage(f'fit {name}', fit_time, pool_start, rows_in=len(y_train), worker=worker)
+            elapsed = pool_start + fit_time
+            for split, (X, y) in splits.items():
+                record_stage(f'predict {name} {split}', predict_times[split], elapsed, rows_in=len(y), worker=worker)
+                elapsed += predict_times[split]
+            model_size = len(pickle.dumps(model))
+            for split, (X, y) in splits.items():
+                rows.append(score_predictions(name, split, y, predictions[split], fit_time,
+                                              predict_times[split], model_size, probabilities[split]))
+    return pd.DataFrame(rows), fitted
+
+
+@traced()
+def train_models(sample_X_train, sample_y_train, sample_X_validate, sample_y_validate, sample_X_test, sample_y_test,
+                 models=MODELS, n_jobs=None, calibrate=None):
+    ''' Fits the Decision Tree, Logistic Regression, Random Forest and Gradient Boosting in parallel and
+        scores the train, validate and test sets. calibrate='isotonic' calibrates the probabilities on
+        the validate set (see run_models). Returns the results table and the fitted models.
+    '''
+    splits = {'train': (sample_X_train, sample_y_train),
+              'validate': (sample_X_validate, sample_y_validate),
+              'test': (sample_X_test, sample_y_test)}
+    return run_models(sample_X_train, sample_y_train, splits, models, n_jobs, calibrate)
+
+
+#---------HYPERPARAMETER SEARCH-------------------
+# Search space per registry model: hyperparameter -> candidate values
+SEARCH_SPACES = {
+    'Decision Tree': {'max_depth': [2, 3, 4, 6, 8, 12, None], 'min_samples_leaf': [1, 10, 100, 1000]},
+    'Logistic Regression': {'C': [0.001, 0.01, 0.1, 1, 10, 100], 'class_weight': [None, 'balanced']},
+    'Random Forest': {'n_estimators': [50, 100, 200], 'max_depth': [5, 10, 20, None],
+                      'min_samples_leaf': [1, 10, 100], 'max_features': ['sqrt', 0.5, 1.0]},
+    'Gradient Boosting': {'learning_rate': [0.03, 0.1, 0.3], 'max_leaf_nodes': [7, 15, 31, 63],
+                          'min_samples_leaf': [20, 200, 2000], 'l2_regularization': [0, 1]},
+}
+
+
+def take_rows(X, rows):
+    ''' Rows of a DataFrame/Series, FeatureMatrix or NumPy array by position '''
+    if isinstance(X, FeatureMatrix):
+        return X.take(rows)
+    return X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+
+
+# Search data of a worker process, set once by init_search_worker instead of pickled into every trial
+_SEARCH_DATA = {}
+
+
+def init_search_worker(X_train, y_train, X_validate, y_validate, order):
+    ''' Pool initializer of search_models: keeps the search data in the worker for all its trials '''
+    _SEARCH_DATA.clear()
+    _SEARCH_DATA.update(X_train=X_train, y_train=y_train, X_validate=X_validate, y_validate=y_validate,
+                        order=order, rungs={})
+
+
+def rung_data(rows):
+    ''' Training rows of a rung (the first rows of the shuffled order, in file order), taken once per worker '''
+    data = _SEARCH_DATA
+    if rows == len(data['order']):
+        return data['X_train'], data['y_train']
+    if rows not in data['rungs']:
+        subset = np.sort(data['order'][:rows])
+        data['rungs'][rows] = take_rows(data['X_train'], subset), take_rows(data['y_train'], subset)
+    return data['rungs'][rows]
+
+
+def run_trial(estimator, params, rows):
+    ''' Fits one configuration on a rung's rows and returns its validate accuracy and fit time (runs in a
+        worker process set up by init_search_worker, one of as many as there are cores, so on one thread)
+    '''
+    X_train, y_train = rung_data(rows)
+    X_validate, y_validate = _SEARCH_DATA['X_validate'], _SEARCH_DATA['y_validate']
+    with threadpool_limits(limits=1):
+        start = time.perf_counter()
+        model = fit_model(estimator, params, X_train, y_train, (X_validate, y_validate))
+        fit_time = time.perf_counter() - start
+        return accuracy_score(y_validate, model.predict(estimator_input(model, X_validate))), fit_time
+
+
+def load_trials(checkpoint):
+    ''' Finished trials from a checkpoint file, keyed by (model, params, rows, data) '''
+    trials = {}
+    if checkpoint and os.path.isfile(checkpoint):
+        with open(checkpoint) as f:
+            for line in f:
+                if line.strip():
+                    trial = json.loads(line)
+                    trials[trial_key(trial['model'], trial['params'], trial['rows'], trial.get('data'))] = trial
+    return trials
+
+
+def trial_key(name, params, rows, data=None):
+    ''' Checkpoint key of one trial; data is the search_data_key of the rows it was fitted and scored on '''
+    return json.dumps([name, params, rows, data], sort_keys=True, default=str)
+
+
+def hash_data(digest, X):
+    ''' Feeds the shape and contents of a frame, Series, FeatureMatrix, array or sparse matrix to a hashlib digest '''
+    if isinstance(X, FeatureMatrix):
+        digest.update(json.dumps(X.columns).encode())
+        X = X.X
+    digest.update(repr((type(X).__name__, X.shape)).encode())
+    if isinstance(X, (pd.DataFrame, pd.Series)):
+        digest.update(repr(list(X.columns) if isinstance(X, pd.DataFrame) else X.name).encode())
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    elif issparse(X):
+        X = X.tocsr()
+        for part in (X.data, X.indices, X.indptr):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        X = np.ascontiguousarray(np.asarray(X))
+        digest.update(str(X.dtype).encode())
+        digest.update(X.tobytes())
+
+
+def search_data_key(X_train, y_train, X_validate, y_validate, random_state=None):
+    ''' Fingerprint of a search's data (the train/validate features and labels) and of the random_state that
+        draws its configurations and rung rows, so a checkpoint written for another search is never reused
+    '''
+    digest = hashlib.sha256(repr(random_state).encode())
+    for data in (X_train, y_train, X_validate, y_validate):
+        hash_data(digest, data)
+    return digest.hexdigest()[:16]
+
+
+@traced()
+def search_models(X_train, y_train, X_validate, y_validate, models=MODELS, spaces=SEARCH_SPACES, n_configs=27,
+                  eta=3, min_rows=10000, checkpoint='search_trials.jsonl', n_jobs=None, random_state=42):
+    ''' Successive halving over each model's search space.
+        Up to n_configs sampled configurations per model start on min_rows training rows; after every rung
+        only the best 1/eta of each model survive, on eta times more rows, until the survivors run on all rows.
+        A model down to one configuration skips the remaining rungs and is fitted once on all rows.
+        Trials run across all cores (each worker gets the data once, when it starts) and are appended to checkpoint as they finish, so an interrupted
+        search resumes where it stopped; trials are keyed by a fingerprint of the data, so a checkpoint
+        from another dataset is ignored. Returns the trial table and a registry of the best
+        configurations for run_models.
+    '''
+    rng = np.random.default_rng(random_state)
+    # nested subsamples: every rung uses a prefix of the same shuffled rows
+    order = rng.permutation(len(y_train))
+    candidates = {}
+    for name, space in spaces.items():
+        grid = list(ParameterGrid(space))
+        if len(grid) > n_configs:
+            grid = [grid[i] for i in sorted(rng.choice(len(grid), n_configs, replace=False))]
+        candidates[name] = [{**models[name][1], **params} for params in grid]
+
+    data = search_data_key(X_train, y_train, X_validate, y_validate, random_state)
+    trials = load_trials(checkpoint)
+    # rows and rung per model still being halved; a lone configuration goes straight to all rows
+    rungs = {name: (len(order) if len(configs) == 1 else min(min_rows, len(order)), 0)
+             for name, configs in candidates.items()}
+    # the data goes to each worker once, when it starts; trials then only send their configuration and rows
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(), initializer=init_search_worker,
+                             initargs=(X_train, y_train, X_validate, y_validate, order)) as pool:
+        while rungs:
+            pending = {}
+            for name, (rows, _) in rungs.items():
+                for params in candidates[name]:
+                    key = trial_key(name, params, rows, data)
+                    if key not in trials:
+                        pending[pool.submit(run_trial, models[name][0], params, rows)] = (name, params, key)
+            for future in as_completed(pending):
+                name, params, key = pending[future]
+                score, fit_time = future.result()
+                rows, rung = rungs[name]
+                trials[key] = {'model': name, 'params': params, 'rows': rows, 'rung': rung,
+                               'score': score, 'fit_time': fit_time, 'data': data}
+                if checkpoint:
+                    with open(checkpoint, 'a') as f:
+                        f.write(json.dumps(trials[key], default=str) + '\n')
+
+            for name, (rows, rung) in list(rungs.items()):
+                ranked = sorted(candidates[name], key=lambda params: -trials[trial_key(name, params, rows, data)]['score'])
+                if rows == len(order):
+                    candidates[name] = ranked[:1]
+                    del rungs[name]
+                    continue
+                # keep the best 1/eta configurations for the next, larger rung
+                candidates[name] = ranked[:max(1, math.ceil(len(ranked) / eta))]
+                rungs[name] = (len(order) if len(candidates[name]) == 1 else min(rows * eta, len(order)), rung + 1)
+
+    results = pd.DataFrame(trials.values())
+    results = results[results['data'] == data].drop(columns='data')
+    results = results.sort_values(['model', 'rows', 'score'], ascending=[True, True, False])
+    best = {name: (models[name][0], configs[0]) for name, configs in candidates.items()}
+    return results.reset_index(drop=True), best
+
+
+#---------OUT-OF-CORE TRAINING-------------------
+def stream_features(filename=CDI_CSV, chunksize=500000, mapping=DEMOGRAPHIC_DUMMIES):
+    ''' Yields (row positions, float32 features, Yes_COPD) for each Topic-filtered chunk of the CDI csv,
+        encoded like prep_copd and keeping only complete rows
+    '''
+    for chunk in read_cdi_chunks(filename, chunksize):
+        features = encode_features(chunk, mapping)
+        complete = features.notna().all(axis=1).to_numpy()
+        target = (chunk['Topic'] == 'Chronic Obstructive Pulmonary Disease').to_numpy(np.uint8)
+        yield chunk.index.to_numpy()[complete], features.to_numpy(np.float32)[complete], target[complete]
+
+
+def holdout_mask(positions, validate_fraction=0.2):
+    ''' Deterministic validate rows: a multiplicative hash of each row's file position, so every pass
+        and every chunksize holds out the same rows
+    '''
+    hashed = (positions.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    return (hashed % np.uint64(10000)) < np.uint64(validate_fraction * 10000)
+
+
+def streaming_metrics(name, confusion, log_loss_sum, fit_time, predict_time, model):
+    ''' One results-table row (same columns as run_models) from an accumulated confusion matrix '''
+    (tn, fp), (fn, tp) = confusion
+    n = confusion.sum()
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {'model': name, 'split': 'validate', 'accuracy': (tp + tn) / max(n, 1),
+            'precision': precision, 'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'fit_time': fit_time, 'predict_time': predict_time,
+            'model_size_mb': len(pickle.dumps(model)) / 1e6, 'log_loss': log_loss_sum / max(n, 1), 'rows': int(n)}
+
+
+@traced()
+def train_out_of_core(filename=CDI_CSV, chunksize=500000, epochs=1, validate_fraction=0.2, alpha=1e-4,
+                      random_state=42):
+    ''' Trains a logistic-loss SGDClassifier on the full CDI history without sampling, one chunk at a time,
+        so memory stays flat whatever the file size. A first pass fits the feature scaler, then each epoch
+        streams the shuffled training chunks through partial_fit, and a last pass accumulates the
+        validate metrics. Returns the fitted scaler+model pipeline and a results table comparable
+        to run_models.
+    '''
+    rng = np.random.default_rng(random_state)
+    scaler = StandardScaler()
+    # averaged SGD settles close to the batch LogisticRegression solution instead of oscillating around it
+    model = SGDClassifier(loss='log_loss', alpha=alpha, average=True, random_state=random_state)
+
+    start = time.perf_counter()
+    for positions, X, y in stream_features(filename, chunksize):
+        scaler.partial_fit(X[~holdout_mask(positions, validate_fraction)])
+    for epoch in range(epochs):
+        for positions, X, y in stream_features(filename, chunksize):
+            train = np.flatnonzero(~holdout_mask(positions, validate_fraction))
+            if len(train):
+                train = rng.permutation(train)
+                model.partial_fit(scaler.transform(X[train]), y[train], classes=[0, 1])
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    log_loss_sum = 0.0
+    for positions, X, y in stream_features(filename, chunksize):
+        validate = holdout_mask(positions, validate_fraction)
+        if not validate.any():
+            continue
+        probability = np.clip(model.predict_proba(scaler.transform(X[validate]))[:, 1], 1e-15, 1 - 1e-15)
+        y_true = y[validate]
+        confusion += np.bincount(y_true * 2 + (probability >= 0.5), minlength=4).reshape(2, 2)
+        log_loss_sum -= np.sum(y_true * np.log(probability) + (1 - y_true) * np.log(1 - probability))
+    predict_time = time.perf_counter() - start
+
+    pipeline = make_pipeline(scaler, model)
+    results = pd.DataFrame([streaming_metrics('SGD Logistic (out-of-core)', confusion, log_loss_sum,
+                                              fit_time, predict_time, pipeline)])
+    return pipeline, results
@@ -0,0 +1,390 @@
+''' Memoized pipeline: prep -> split -> X/y -> models, with the stats battery and the figures beside them.
+    Every stage declares its inputs and parameters; its output is stored under a key hashed from the
+    stage, its parameters and its inputs' keys, so a change re-runs only the stages downstream of it.
+    The key also hashes the stage function's source, so editing a stage function re-runs it. Edits to the
+    library code a stage calls (prep_copd, train_models, ...) do NOT change any key: bump PIPELINE_VERSION
+    (or CACHE_VERSION for prep) when such an edit changes a stage's output.
+    python -m wrangle.pipeline [CDI csv] [--dry-run] [--param "models.estimators.Random Forest.max_depth=12"]
+'''
+import copy
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .instrument import record_stage, traced
+from .prepare import CACHE_VERSION, CDI_CSV, file_fingerprint
+
+# Stage outputs are pickled here as <key>.pkl
+PIPELINE_STORE = '.copd_pipeline'
+
+# Least recently used outputs are evicted once the store is larger than this
+PIPELINE_STORE_MB = 2000
+
+# Bump when a stage's output changes for the same inputs and parameters
+PIPELINE_VERSION = 1
+
+
+#---------STAGES-------------------
+def prep_stage(filename, chunksize, sample_size, stratify, out_dir='.'):
+    ''' prep_copd, writing COPD.csv and the count cube to out_dir (the stage's directory in the store) '''
+    from .prepare import prep_copd
+    return prep_copd(filename, chunksize, sample_size, stratify, out_dir=out_dir)
+
+
+def split_stage(df_sample):
+    from .split import split_sample
+    return split_sample(df_sample)
+
+
+def X_y_stage(splits, layout):
+    ''' X_y_split's frames, or with layout='dense'/'sparse' the FeatureMatrix equivalents '''
+    if layout == 'frame':
+        from .split import X_y_split
+        return X_y_split(*splits)
+    from .features import X_y_matrices
+    train, validate, test = X_y_matrices(*splits, layout=layout)
+    return train, train.y, validate, validate.y, test, test.y
+
+
+def stats_stage(splits, n_resamples, random_state, n_jobs=None):
+    from .stats import chi_square_tests, contingency_tables, expected_counts, resampling_tests
+    sample_train = splits[0]
+    tables = contingency_tables(sample_train)
+    return {'chi_square': chi_square_tests(sample_train, tables=tables), 'expected': expected_counts(tables),
+            'resampling': resampling_tests(sample_train, n_resamples, random_state=random_state, n_jobs=n_jobs,
+                                           tables=tables)}
+
+
+def figures_stage(splits, formats, n_jobs=None):
+    ''' The build_report figures as {file name: bytes} plus their render times, so they live in the store '''
+    from .report import build_report
+    with tempfile.TemporaryDirectory() as out_dir:
+        rendered = build_report(splits[0], out_dir, tuple(formats), n_jobs)
+        files = {}
+        for figure in rendered.values():
+            for file in figure['files']:
+                with open(os.path.join(out_dir, file), 'rb') as f:
+                    files[file] = f.read()
+    return {'rendered': rendered, 'files': files}
+
+
+def models_stage(X_y, estimators, n_jobs=None):
+    ''' train_models on the registry estimators with the given hyperparameters ({model: params}) '''
+    from .model import MODELS, train_models
+    registry = {name: (MODELS[name][0], params) for name, params in estimators.items()}
+    return train_models(*X_y, models=registry, n_jobs=n_jobs)
+
+
+def _registry_params():
+    from .model import MODELS
+    return {name: params for name, (_, params) in MODELS.items()}
+
+
+# Stage name -> (function, input stages, parameters); a stage's inputs are passed positionally, then its parameters.
+# run_stage also passes n_jobs (the stage's share of the cores) and out_dir (a store directory for files the
+# stage writes) to the functions that take them; neither is part of the stage key.
+PIPELINE = {
+    'prep': (prep_stage, (), {'filename': CDI_CSV, 'chunksize': None, 'sample_size': 1000000, 'stratify': None}),
+    'split': (split_stage, ('prep',), {}),
+    'X_y': (X_y_stage, ('split',), {'layout': 'frame'}),
+    'stats': (stats_stage, ('split',), {'n_resamples': 1000, 'random_state': 42}),
+    'figures': (figures_stage, ('split',), {'formats': ['png']}),
+    'models': (models_stage, ('X_y',), {'estimators': None}),
+}
+
+
+def merge_params(target, source):
+    ''' Merges source into target in place, dict values key by key '''
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_params(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def pipeline_params(overrides=None, pipeline=PIPELINE):
+    ''' Every stage's parameters with overrides ({stage: {param: value}}) merged in, so
+        {'models': {'estimators': {'Random Forest': {'max_depth': 12}}}} changes one value
+    '''
+    params = {name: copy.deepcopy(stage_params) for name, (_, _, stage_params) in pipeline.items()}
+    if 'models' in params and params['models'].get('estimators') is None:
+        params['models']['estimators'] = _registry_params()
+    for name, stage_overrides in (overrides or {}).items():
+        if name not in params:
+            raise ValueError(f'Unknown pipeline stage {name!r}; stages are {list(params)}')
+        merge_params(params[name], stage_overrides)
+    return params
+
+
+def pipeline_order(pipeline=PIPELINE):
+    ''' Stage names with every stage after its inputs '''
+    order = []
+
+    def visit(name, path):
+        if name in order:
+            return
+        if name in path:
+            raise ValueError(f'Pipeline cycle through {name!r}')
+        for upstream in pipeline[name][1]:
+            visit(upstream, path + (name,))
+        order.append(name)
+
+    for name in pipeline:
+        visit(name, ())
+    return order
+
+
+def function_source(func):
+    ''' Source code of a stage function, or its qualified name when the source is not available '''
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return f'{func.__module__}.{func.__qualname__}'
+
+
+def stage_keys(params, pipeline=PIPELINE):
+    ''' Content key of every stage: a hash of the stage, its function's source, its parameters and its
+        inputs' keys. A stage reading a file (a 'filename' parameter) also hashes the file's fingerprint.
+        Only the stage function's own source is hashed, not the library code it calls (see PIPELINE_VERSION).
+    '''
+    keys = {}
+    for name in pipeline_order(pipeline):
+        func, inputs, _ = pipeline[name]
+        key = {'version': [PIPELINE_VERSION, CACHE_VERSION], 'stage': name,
+               'function': f'{func.__module__}.{func.__qualname__}',
+               'code': hashlib.sha256(function_source(func).encode()).hexdigest(), 'params': params[name],
+               'inputs': [keys[upstream] for upstream in inputs]}
+        if 'filename' in params[name]:
+            key['source'] = file_fingerprint(params[name]['filename'])
+        keys[name] = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:20]
+    return keys
+
+
+#---------STORE-------------------
+def store_path(key, store=PIPELINE_STORE):
+    return os.path.join(store, f'{key}.pkl')
+
+
+def store_files(key, store=PIPELINE_STORE):
+    ''' Directory of the files a stage writes besides its output (e.g. prep's COPD.csv), evicted with it '''
+    return os.path.join(store, key)
+
+
+def remove_output(key, store=PIPELINE_STORE):
+    ''' Deletes a stored output and its files '''
+    if os.path.isfile(store_path(key, store)):
+        os.remove(store_path(key, store))
+    shutil.rmtree(store_files(key, store), ignore_errors=True)
+
+
+def output_size(path):
+    ''' Bytes of a file, or of every file under a directory '''
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+
+def store_get(key, store=PIPELINE_STORE):
+    ''' The stored output of key; marks it as recently used '''
+    path = store_path(key, store)
+    with open(path, 'rb') as f:
+        output = pickle.load(f)
+    os.utime(path)
+    return output
+
+
+def store_put(key, output, store=PIPELINE_STORE):
+    ''' Pickles an output under its key; returns the size in bytes '''
+    os.makedirs(store, exist_ok=True)
+    path = store_path(key, store)
+    # write then rename so an interrupted stage never leaves a truncated output behind
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def evict_store(store=PIPELINE_STORE, max_mb=PIPELINE_STORE_MB, keep=()):
+    ''' Deletes the least recently used outputs (with their files) until the store fits in max_mb. Keys in
+        keep (the current run's) go last, and only when they alone are over the cap. Returns the evicted keys.
+    '''
+    if not os.path.isdir(store):
+        return []
+    entries = {}
+    for file in os.listdir(store):
+        path = os.path.join(store, file)
+        if file.endswith('.pkl') or os.path.isdir(path):
+            key = file[:-4] if file.endswith('.pkl') else file
+            # an output is as recent as its pickle, which store_get touches; its files add to its size
+            _, mtime, size = entries.get(key, (None, 0, 0))
+            entries[key] = (key in keep, max(mtime, os.stat(path).st_mtime), size + output_size(path))
+    total = sum(size for _, _, size in entries.values())
+    evicted = []
+    for (_, _, size), key in sorted((entry, key) for key, entry in entries.items()):
+        if total <= max_mb * 1e6:
+            break
+        remove_output(key, store)
+        total -= size
+        evicted.append(key)
+    return evicted
+
+
+#---------RUNNER-------------------
+def run_stage(name, key, params, input_keys, store=PIPELINE_STORE, pipeline=PIPELINE, n_jobs=1):
+    ''' Runs one stage on its stored inputs and stores its output (runs in a worker process).
+        A stage function taking n_jobs gets the cores it may use, one taking out_dir its store_files directory.
+        Returns the wall time and the output size.
+    '''
+    func = pipeline[name][0]
+    accepted = inspect.signature(func).parameters
+    runtime = {}
+    if 'n_jobs' in accepted:
+        runtime['n_jobs'] = n_jobs
+    if 'out_dir' in accepted:
+        runtime['out_dir'] = store_files(key, store)
+        os.makedirs(runtime['out_dir'], exist_ok=True)
+    inputs = [store_get(input_key, store) for input_key in input_keys]
+    start = time.perf_counter()
+    output = func(*inputs, **params, **runtime)
+    wall = time.perf_counter() - start
+    return wall, store_put(key, output, store)
+
+
+def pipeline_leaves(pipeline=PIPELINE):
+    ''' Stages no other stage reads: the default targets '''
+    inputs = {upstream for _, stage_inputs, _ in pipeline.values() for upstream in stage_inputs}
+    return [name for name in pipeline if name not in inputs]
+
+
+def plan_pipeline(params, targets=None, store=PIPELINE_STORE, pipeline=PIPELINE):
+    ''' The stages targets need, in order, each with its key and whether its output is already stored.
+        A stored stage is skipped along with everything upstream of it that nothing else needs.
+    '''
+    keys = stage_keys(params, pipeline)
+    needed, pending = set(), list(targets or pipeline_leaves(pipeline))
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        if not os.path.isfile(store_path(keys[name], store)):
+            pending.extend(pipeline[name][1])
+    return [{'stage': name, 'key': keys[name], 'cached': os.path.isfile(store_path(keys[name], store))}
+            for name in pipeline_order(pipeline) if name in needed]
+
+
+@traced()
+def run_pipeline(overrides=None, targets=None, store=PIPELINE_STORE, max_mb=PIPELINE_STORE_MB, n_jobs=None,
+                 dry_run=False, pipeline=PIPELINE):
+    ''' Runs the stages targets need (default: stats, figures and models), skipping those already stored.
+        Stages whose inputs are ready run at the same time in a process pool, so the stats battery,
+        the figures and model fitting overlap once split is done. n_jobs (default: every core) is the budget
+        they share: stages starting together split the cores not held by running stages, and a stage's own
+        pools (resampling, figure rendering, model fitting) stay within its share.
+        Prints the plan; dry_run=True stops there. Returns {target: output}, or the plan on a dry run.
+    '''
+    params = pipeline_params(overrides, pipeline)
+    plan = plan_pipeline(params, targets, store, pipeline)
+    keys = {step['stage']: step['key'] for step in plan}
+    print(f"{'stage':<10} {'key':<22} {'status':<6}")
+    for step in plan:
+        print(f"{step['stage']:<10} {step['key']:<22} {'hit' if step['cached'] else 'run':<6}")
+    if dry_run:
+        return plan
+
+    # hits count as used, so the eviction keeps them over older outputs
+    for step in plan:
+        if step['cached']:
+            os.utime(store_path(step['key'], store))
+    to_run = {step['stage'] for step in plan if not step['cached']}
+    done = {step['stage'] for step in plan if step['cached']}
+    running = {}
+    budget = n_jobs or os.cpu_count()
+    pool_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=budget) as pool:
+        while to_run or running:
+            ready = [name for name in to_run if all(upstream in done for upstream in pipeline[name][1])]
+            free = budget - sum(share for _, _, share in running.values())
+            for name in ready:
+                to_run.discard(name)
+                share = max(1, free // len(ready))
+                input_keys = [keys[upstream] for upstream in pipeline[name][1]]
+                running[pool.submit(run_stage, name, keys[name], params[name], input_keys, store, pipeline, share)] = \
+                    (name, time.perf_counter(), share)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, start, share = running.pop(future)
+                wall, size = future.result()
+                done.add(name)
+                record_stage(f'stage {name}', wall, start, worker=list(pipeline).index(name) + 1,
+                             key=keys[name], output_mb=size / 1e6, n_jobs=share)
+                print(f'{name:<10} {wall:8.2f}s {size / 1e6:10.1f} MB  {share:>3} jobs  '
+                      f'(+{time.perf_counter() - pool_start:.1f}s)')
+
+    outputs = {name: store_get(keys[name], store) for name in (targets or pipeline_leaves(pipeline))}
+    evicted = evict_store(store, max_mb, keep=set(keys.values()))
+    if evicted:
+        print(f'Evicted {len(evicted)} least recently used outputs from {store}')
+    return outputs
+
+
+def write_figures(figures, out_dir='report'):
+    ''' Writes the figures stage's files and the report index.html/timings.json to out_dir '''
+    from .report import write_report_index
+    os.makedirs(out_dir, exist_ok=True)
+    for file, data in figures['files'].items():
+        with open(os.path.join(out_dir, file), 'wb') as f:
+            f.write(data)
+    write_report_index(out_dir, figures['rendered'])
+
+
+def parse_param(text):
+    ''' 'stage.param[.key...]=value' -> {stage: {param: ...value}}; value is JSON when it parses '''
+    path, _, value = text.partition('=')
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+    for part in reversed(path.split('.')):
+        value = {part: value}
+    return value
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run the memoized COPD pipeline')
+    parser.add_argument('filename', nargs='?', default=CDI_CSV, help='CDI csv')
+    parser.add_argument('--param', action='append', default=[],
+                        help='stage parameter override, e.g. "models.estimators.Random Forest.max_depth=12" '
+                             'or prep.sample_size=null')
+    parser.add_argument('--targets', default=None, help='comma separated stages to bring up to date '
+                                                        '(default: stats, figures, models)')
+    parser.add_argument('--store', default=PIPELINE_STORE, help='stage output store')
+    parser.add_argument('--max-mb', type=float, default=PIPELINE_STORE_MB, help='store size cap')
+    parser.add_argument('--jobs', type=int, default=None, help='cores shared by the stages (default: all)')
+    parser.add_argument('--report', default='report', help='directory the figures are written to')
+    parser.add_argument('--dry-run', action='store_true', help='only show which stages are cache hits')
+    args = parser.parse_args()
+
+    overrides = {'prep': {'filename': args.filename}}
+    for text in args.param:
+        merge_params(overrides, parse_param(text))
+    targets = args.targets.split(',') if args.targets else None
+    outputs = run_pipeline(overrides, targets, args.store, args.max_mb, args.jobs, args.dry_run)
+    if not args.dry_run:
+        if 'stats' in outputs:
+            print(outputs['stats']['chi_square'].to_string(index=False))
+        if 'models' in outputs:
+            results, _ = outputs['models']
+            print(results.pivot(index='model', columns='split', values='accuracy').round(4))
+        if 'figures' in outputs:
+            write_figures(outputs['figures'], args.report)
+            print(f'Figures written to {args.report}')
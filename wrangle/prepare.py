@@ -0,0 +1,435 @@
+''' Acquire & prepare: reads the CDI csv, cleans it into the COPD frame and builds the count cube.
+    Only needs pandas and NumPy, so prep_copd starts without the plotting and ML stacks.
+'''
+import hashlib
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .instrument import Stage, traced
+
+
+#---------- ACQUIRE & PREPARE-------
+# Dataset csv from https://catalog.data.gov/dataset/u-s-chronic-disease-indicators-cdi
+CDI_CSV = 'U.S._Chronic_Disease_Indicators__CDI_.csv'
+
+# Raw CDI columns that prep_copd keeps, with compact dtypes assigned at parse time
+CDI_DTYPES = {'YearStart': 'int16', 'LocationAbbr': 'category', 'Topic': 'category',
+              'StratificationCategory1': 'category', 'Stratification1': 'category', 'GeoLocation': 'category'}
+
+# List of columns to remove from Dataframe.
+COLUMNS_TO_REMOVE = ['YearEnd', 'Response', 'StratificationCategory2', 'Stratification2', 'StratificationCategory3', 'DataValue',
+                     'Stratification3', 'ResponseID', 'StratificationCategoryID2', 'StratificationID2',
+                     'StratificationCategoryID3', 'StratificationID3','DataValueTypeID','QuestionID', 'TopicID','LocationID','HighConfidenceLimit','LowConfidenceLimit','YearEnd','LocationDesc','DataValueUnit','DataValueType','DataValueAlt','DataValueFootnoteSymbol','DatavalueFootnote','StratificationCategoryID1','StratificationID1','Question','DataSource']
+
+#change column names to be more readable
+RENAME_COLUMNS = {'YearStart':'Year', 'Stratification1':'Demographics','GeoLocation':'Geo Location', 'LocationAbbr' : 'State Abbr','Topic': 'Disease'}
+
+# List of values to remove from the 'Topic' column
+TOPICS_TO_REMOVE = ['Asthma', 'Arthritis', 'Nutrition, Physical Activity, and Weight Status', 'Overarching Conditions','Alcohol','Tobacco','Chronic Kidney Disease','Older Adults','Oral Health','Mental Health','Immunization','Reproductive Health','Disability']
+
+
+# 'Geo Location' values look like 'POINT (-86.63186076199969 32.84057112200048)'
+GEO_PATTERN = r'POINT \((-?\d+\.\d+) (-?\d+\.\d+)\)'
+
+# Model inputs, in the column order X_y_split produces
+FEATURE_COLUMNS = ['Year', 'Longitude', 'Latitude', 'Yes_female', 'Yes_White', 'Yes_Black', 'Yes_Hispanic',
+                   'Yes_Asian_PI', 'Yes_Native_Amn', 'Yes_Other', 'Yes_Multiracial']
+
+# 'Demographics' value behind each one-hot "dummy" column
+DEMOGRAPHIC_DUMMIES = {'Yes_female': 'Female', 'Yes_White': 'White, non-Hispanic', 'Yes_Black': 'Black, non-Hispanic',
+                       'Yes_Hispanic': 'Hispanic', 'Yes_Asian_PI': 'Asian or Pacific Islander',
+                       'Yes_Native_Amn': 'American Indian or Alaska Native', 'Yes_Other': 'Other, non-Hispanic',
+                       'Yes_Multiracial': 'Multiracial, non-Hispanic'}
+
+
+def concat_chunks(chunks):
+    ''' Concatenates reduced chunks and keeps the categorical columns categorical
+        (pd.concat falls back to object when the chunks have different categories)
+    '''
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in CDI_DTYPES.items()})
+    df = pd.concat(chunks)
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Categorical(pd.api.types.union_categoricals([chunk[col] for chunk in chunks]))
+    return df
+
+
+def read_cdi_chunks(filename=CDI_CSV, chunksize=500000, counts=None):
+    ''' Yields the CDI csv chunk by chunk, reading only the columns prep_copd keeps and
+        dropping the unused Topic rows from each chunk as it arrives.
+        If a counts dict is passed, counts['rows_read'] tracks the raw rows parsed so far.
+    '''
+    rows_read = 0
+    for chunk in pd.read_csv(filename, usecols=list(CDI_DTYPES), dtype=CDI_DTYPES, chunksize=chunksize):
+        # index rows by their position in the file so the chunks line up with a full read_csv
+        chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+        rows_read += len(chunk)
+        if counts is not None:
+            counts['rows_read'] = rows_read
+        yield chunk[~chunk['Topic'].isin(TOPICS_TO_REMOVE)]
+
+
+@traced()
+def read_cdi_chunked(filename=CDI_CSV, chunksize=500000):
+    ''' Reads the CDI csv in reduced chunks so peak memory depends on chunksize, not file size.
+        Prints rows/sec and peak memory for the run.
+    '''
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+
+    counts = {'rows_read': 0}
+    df = concat_chunks(read_cdi_chunks(filename, chunksize, counts))
+    rows_read = counts['rows_read']
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+    print(f'Read {rows_read:,} rows ({len(df):,} kept) in {elapsed:.2f}s: '
+          f'{rows_read / max(elapsed, 1e-9):,.0f} rows/sec, peak memory {peak / 1e6:,.1f} MB')
+    return df
+
+
+@traced()
+def reservoir_sample(filename=CDI_CSV, n=1000000, chunksize=500000, stratify=None, random_state=42,
+                     per_stratum=True):
+    ''' One-pass reservoir sample of the Topic-filtered CDI rows, read chunk by chunk.
+        Every row gets a seeded uniform key and only the n smallest keys are kept, so the cost scales
+        with the reservoir instead of the file and the same seed gives the same sample on every run.
+        stratify ('Topic', 'YearStart' or 'LocationAbbr') keeps a reservoir of n rows per stratum;
+        with per_stratum=False n is the total instead, split evenly across the strata (at most n // strata
+        rows each, fewer for strata that have fewer rows).
+        Each chunk is first cut against the largest kept key of its stratum; the survivors are merged into
+        the reservoir only once they add up to a full reservoir, so it is not re-sorted on every chunk.
+    '''
+    rng = np.random.default_rng(random_state)
+    reservoir, pieces, added = None, [], 0
+    # largest kept key of each full stratum (a float when unstratified): rows must beat it to get in
+    limits = None
+    strata = set()
+    for chunk in read_cdi_chunks(filename, chunksize):
+        # keys are drawn in file order, so the sample does not depend on chunksize
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        if stratify is not None:
+            strata.update(chunk[stratify].dropna().unique())
+            chunk = chunk[chunk[stratify].notna()]
+        if limits is not None:
+            bound = limits if stratify is None else limits.reindex(chunk[stratify].to_numpy()).fillna(np.inf).to_numpy()
+            chunk = chunk[chunk['_key'].to_numpy() < bound]
+        pieces.append(chunk)
+        added += len(chunk)
+        # the per-stratum share only shrinks as strata turn up, so rows trimmed early stay out
+        size = n if per_stratum or stratify is None else max(1, n // max(len(strata), 1))
+        capacity = size if stratify is None else size * len(strata)
+        # merge and trim only once a reservoir's worth of candidates has piled up, not on every chunk
+        if added >= capacity:
+            reservoir = trim_reservoir([reservoir, *pieces], stratify, size)
+            pieces, added = [], 0
+            if stratify is None:
+                limits = reservoir['_key'].iloc[-1] if len(reservoir) == size else None
+            else:
+                counts = reservoir.groupby(stratify, observed=True)['_key'].agg(['size', 'max'])
+                limits = counts.loc[counts['size'] >= size, 'max']
+    if reservoir is None and not pieces:
+        return concat_chunks([])
+    size = n if per_stratum or stratify is None else max(1, n // max(len(strata), 1))
+    return trim_reservoir([reservoir, *pieces], stratify, size).drop(columns='_key')
+
+
+def trim_reservoir(frames, stratify, size):
+    ''' The size smallest-key rows (per stratum when stratify is given) of the frames, in key order '''
+    merged = concat_chunks([frame for frame in frames if frame is not None]).sort_values('_key')
+    if stratify is None:
+        return merged.head(size)
+    return merged.groupby(stratify, observed=True, sort=False).head(size)
+
+
+@traced()
+def encode_dummies(values, mapping=DEMOGRAPHIC_DUMMIES, sparse=False):
+    ''' One-hot encodes values against mapping ({column: category}) in one vectorized pass.
+        Returns a uint8 DataFrame, or a (csr_matrix, column names) pair when sparse=True.
+        Pass the same mapping when scoring new data so training and inference encode identically.
+    '''
+    columns = list(mapping)
+    categories = pd.Index(list(mapping.values()))
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # translate the existing categorical codes instead of comparing strings; code -1 (NaN) stays -1
+        lookup = np.append(categories.get_indexer(values.cat.categories), -1)
+        codes = lookup[values.cat.codes.to_numpy()]
+    else:
+        codes = categories.get_indexer(values)
+    rows = np.flatnonzero(codes >= 0)
+    if sparse:
+        # scipy is only loaded for the sparse layout
+        import scipy.sparse as sparse_matrix
+        ones = np.ones(len(rows), dtype=np.uint8)
+        return sparse_matrix.csr_matrix((ones, (rows, codes[rows])), shape=(len(codes), len(columns))), columns
+    dummies = np.zeros((len(codes), len(columns)), dtype=np.uint8)
+    dummies[rows, codes[rows]] = 1
+    return pd.DataFrame(dummies, index=values.index, columns=columns)
+
+
+@traced()
+def parse_geo(values, dtype='float64', verbose=True):
+    ''' Parses 'POINT (longitude latitude)' strings into Longitude and Latitude columns.
+        Each distinct location is parsed once and broadcast back through its factorized code.
+        Empty and malformed points come back as NaN; they are counted, returned as a dict next to
+        the coordinates and printed when verbose.
+    '''
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    parsed = uniques.str.extract(GEO_PATTERN).astype(dtype).to_numpy()
+    # code -1 (NaN) picks the trailing NaN row
+    parsed = np.vstack([parsed, np.full((1, 2), np.nan, dtype=dtype)])
+    coordinates = pd.DataFrame(parsed[codes], index=values.index, columns=['Longitude', 'Latitude'])
+
+    blank = np.append(uniques.str.strip().eq('').to_numpy(), True)
+    failed = np.isnan(parsed[:, 0])
+    counts = np.bincount(np.where(codes < 0, len(uniques), codes), minlength=len(parsed))
+    problems = {'empty': int(counts[blank].sum()),
+                'malformed': int(counts[failed & ~blank].sum()),
+                'malformed_values': uniques[failed[:-1] & ~blank[:-1]].tolist()}
+    if verbose and (problems['empty'] or problems['malformed']):
+        print(f"Geo Location: {problems['empty']:,} empty and {problems['malformed']:,} malformed points "
+              f"({len(problems['malformed_values'])} distinct malformed values) left as NaN")
+    return coordinates, problems
+
+
+def state_coordinates(df_sample):
+    ''' State Abbr -> Longitude/Latitude lookup table for map_graph and downstream joins '''
+    coordinates = df_sample[['State Abbr', 'Longitude', 'Latitude']].dropna()
+    return coordinates.groupby('State Abbr', observed=True)[['Longitude', 'Latitude']].first()
+
+
+@traced()
+def clean_copd(df_sample):
+    ''' Cleans raw CDI rows into the COPD frame used for the analysis '''
+    with Stage('drop_columns_topics', rows_in=len(df_sample)) as stage:
+        # Drop unnecessary columns from the Dataframe
+        df_sample = df_sample.drop(columns=COLUMNS_TO_REMOVE, errors='ignore')
+
+         #change column names to be more readable
+        df_sample = df_sample.rename(columns=RENAME_COLUMNS)
+
+        # Drop rows with specific values from the 'Topic' column
+        df_sample = df_sample.drop(df_sample[df_sample['Disease'].isin(TOPICS_TO_REMOVE)].index)
+        stage.rows_out = len(df_sample)
+
+    # Extract float longitude and latitude from 'Geo Location' column, parsing each distinct point once
+    coordinates, _ = parse_geo(df_sample['Geo Location'])
+    df_sample = pd.concat([df_sample, coordinates], axis=1)
+    # df_sample.drop('Geo Location')
+
+
+
+    ''' Will use COPD to create one-hot code "dummy" value for prevalaence "Yes_COPD" and Cardiovascular Disease, Diabetes & COPD. I will remove other Topics column '''
+    with Stage('copd_race_columns', rows_in=len(df_sample)):
+        # Create a dummy variable for the 'Yes_COPD' column
+        df_sample['Yes_COPD'] = np.where(df_sample['Disease'] == 'Chronic Obstructive Pulmonary Disease', 1, 0).astype(int)
+        # Drop the original 'Disease' column
+        df_sample.drop('Disease', axis=1, inplace=True)
+
+        # Create a new column 'Race/Ethnicity' based on the condition
+        df_sample['Race/Ethnicity'] = np.where(df_sample.StratificationCategory1 == 'Race/Ethnicity', df_sample.Demographics, '')
+
+    # Will use Female and the race groups to create one-hot code "dummy" values in one pass over 'Demographics'
+    df_sample = pd.concat([df_sample, encode_dummies(df_sample['Demographics'])], axis=1)
+
+
+    #Remove nulls
+    with Stage('dropna', rows_in=len(df_sample)) as stage:
+        df_sample.dropna(inplace=True)
+        stage.rows_out = len(df_sample)
+    return df_sample
+
+
+# Low-cardinality string columns of the prepared frame, stored as categoricals by optimize_dtypes
+CATEGORY_COLUMNS = ['State Abbr', 'StratificationCategory1', 'Demographics', 'Geo Location', 'Race/Ethnicity']
+
+# Cleaned COPD frames are cached here as parquet, keyed by source fingerprint + cleaning parameters
+CACHE_DIR = '.copd_cache'
+# Bump when clean_copd or the sampling changes so existing caches are rebuilt
+CACHE_VERSION = 4
+
+
+def file_fingerprint(filename, full_hash=False, block_size=1 << 20):
+    ''' Fingerprint of a source file: size, mtime and a sha256 of its first and last blocks.
+        full_hash=True hashes every byte instead (as slow as reading the csv).
+    '''
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        if full_hash:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        else:
+            digest.update(f.read(block_size))
+            if stat.st_size > block_size:
+                f.seek(max(stat.st_size - block_size, block_size))
+                digest.update(f.read(block_size))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def cache_key(filename, **params):
+    ''' Cache key for a cleaned frame: changes whenever the source file or a cleaning parameter changes '''
+    key = {'version': CACHE_VERSION, 'source': file_fingerprint(filename), 'params': params}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+@traced()
+def write_cache(df_sample, path):
+    ''' Writes the cleaned frame as parquet with typed columns and categorical Demographics/State Abbr '''
+    df_sample = df_sample.astype({'Demographics': 'category', 'State Abbr': 'category'})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # write then rename so an interrupted run never leaves a half-written cache behind
+    tmp_path = path + '.tmp'
+    df_sample.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return df_sample
+
+
+@traced()
+def read_cache(path):
+    ''' Memory-maps a cached cleaned frame '''
+    return pd.read_parquet(path, memory_map=True)
+
+
+def encode_features(df, mapping=DEMOGRAPHIC_DUMMIES, verbose=False):
+    ''' Applies prep_copd's feature encoding to raw CDI rows (or already renamed ones) without sampling,
+        Topic filtering or dropping rows. Returns the FEATURE_COLUMNS frame; rows without a usable
+        Geo Location have NaN coordinates.
+    '''
+    df = df.rename(columns=RENAME_COLUMNS)
+    coordinates, _ = parse_geo(df['Geo Location'], verbose=verbose)
+    features = pd.concat([df[['Year']], coordinates, encode_dummies(df['Demographics'], mapping)], axis=1)
+    return features[['Year', 'Longitude', 'Latitude'] + list(mapping)]
+
+
+@traced()
+def optimize_dtypes(df_sample, verbose=True):
+    ''' Shrinks the prepared frame: low-cardinality strings become categoricals, the Yes_* flags uint8,
+        Year int16 and the coordinates float32. Prints a before/after memory report when verbose.
+    '''
+    before = df_sample.memory_usage(deep=True)
+    dtypes = {col: 'category' for col in CATEGORY_COLUMNS}
+    dtypes.update({col: 'uint8' for col in df_sample.columns if col.startswith('Yes_')})
+    dtypes.update({'Year': 'int16', 'Longitude': 'float32', 'Latitude': 'float32'})
+    df_sample = df_sample.astype({col: dtype for col, dtype in dtypes.items() if col in df_sample.columns})
+    if verbose:
+        after = df_sample.memory_usage(deep=True)
+        report = pd.DataFrame({'dtype': df_sample.dtypes.astype(str), 'before MB': before / 1e6, 'after MB': after / 1e6})
+        print(report.round(2).fillna(''))
+        print(f'Memory: {before.sum() / 1e6:,.1f} MB -> {after.sum() / 1e6:,.1f} MB '
+              f'({before.sum() / max(after.sum(), 1):.1f}x smaller)')
+    return df_sample
+
+
+@traced()
+def prep_copd(filename=CDI_CSV, chunksize=None, sample_size=1000000, stratify=None, compact=False,
+              cache=False, cache_dir=CACHE_DIR, out_dir='.'):
+    '''
+     The below functions prepares DHSS CDI for COPD prevalance analysis.
+     Pass chunksize to stream the csv in column-pruned, Topic-filtered chunks instead of one full read_csv;
+     the sample is then drawn in the same pass with reservoir_sample (optionally stratified).
+     sample_size is always the total: with stratify it is split evenly across the strata, so each
+     stratum contributes at most sample_size // strata rows.
+     sample_size=None keeps every row. stratify needs chunksize (a ValueError otherwise), since only the
+     reservoir sample stratifies.
+     compact=True returns the frame with optimize_dtypes applied.
+     cache=True returns the cached parquet frame while the source file and parameters are unchanged.
+     COPD.csv and the count cube (CUBE_CSV) are written to out_dir.
+    '''
+    if stratify is not None and not chunksize:
+        raise ValueError(f'stratify={stratify!r} needs chunksize: only the chunked reservoir sample stratifies')
+    if cache:
+        key = cache_key(filename, chunked=bool(chunksize), sample_size=sample_size, stratify=stratify, compact=compact)
+        cache_path = os.path.join(cache_dir, f'COPD-{key}.parquet')
+        if os.path.isfile(cache_path):
+            return read_cache(cache_path)
+
+    if chunksize and sample_size:
+        # unused columns and Topics never reach memory, so the sample is drawn from the COPD-relevant rows
+        df_sample = reservoir_sample(filename, sample_size, chunksize, stratify=stratify, random_state=42,
+                                     per_stratum=False)
+    elif chunksize:
+        df_sample = read_cdi_chunked(filename, chunksize)
+    else:
+        # Save and read dataset csv from https://catalog.data.gov/dataset/u-s-chronic-disease-indicators-cdi
+        with Stage('read_csv') as stage:
+            df = pd.read_csv(filename)
+            stage.rows_out = len(df)
+
+        #created sample DF with random state of 42 to review and clean data rapidly
+        with Stage('sample', rows_in=len(df)) as stage:
+            df_sample = df.sample(n=sample_size, random_state=42) if sample_size else df
+            stage.rows_out = len(df_sample)
+        del df
+
+    df_sample = clean_copd(df_sample)
+
+    ''' This function creates a csv '''
+    cdi = df_sample
+
+    # Save the DataFrame to a CSV file
+    with Stage('write_copd_csv', rows_in=len(df_sample)):
+        df_sample.to_csv(os.path.join(out_dir, "COPD.csv"), index=False)
+    # Save the count cube next to it for the graphs and dashboards
+    build_cube(df_sample).to_csv(os.path.join(out_dir, CUBE_CSV), index=False)
+
+    if compact:
+        df_sample = optimize_dtypes(df_sample)
+    if cache:
+        df_sample = write_cache(df_sample, cache_path)
+    return df_sample
+
+
+#------- COUNT CUBE-----
+# Keys of the pre-aggregated count cube
+CUBE_COLUMNS = ['Year', 'State Abbr', 'Demographics', 'Yes_COPD']
+# The cube is saved next to COPD.csv
+CUBE_CSV = 'COPD_cube.csv'
+
+# Demographics values plotted by demographic_graph and race_graph
+RACE_GROUPS = ['White, non-Hispanic','Black, non-Hispanic', 'Hispanic', 'Asian or Pacific Islander', 'American Indian or Alaska Native', 'Other, non-Hispanic','Multiracial, non-Hispanic']
+
+# Columns tested against Yes_COPD (contingency tables in stats, per-partition tables in incremental)
+CONTINGENCY_COLUMNS = ['Yes_female', 'Race/Ethnicity', 'Year', 'State Abbr']
+
+
+@traced()
+def build_cube(df_sample):
+    ''' Row counts per (Year, State Abbr, Demographics, Yes_COPD), built in a single groupby pass '''
+    return df_sample.groupby(CUBE_COLUMNS, observed=True).size().rename('count').reset_index()
+
+
+def load_cube(filename=CUBE_CSV):
+    ''' Reads a saved count cube '''
+    return pd.read_csv(filename, dtype={'Year': 'int16', 'State Abbr': 'category', 'Demographics': 'category',
+                                        'Yes_COPD': 'uint8', 'count': 'int64'})
+
+
+def as_cube(data):
+    ''' data itself if it already is a count cube, otherwise the cube of its rows '''
+    if 'count' in data.columns and set(CUBE_COLUMNS) <= set(data.columns):
+        return data
+    return build_cube(data)
+
+
+def cube_counts(data, by, **filters):
+    ''' Sums the cube's counts over the by columns, after keeping cells whose column is in filters[column].
+        Works in O(cells) on a cube; a row-level frame is aggregated first.
+    '''
+    cube = as_cube(data)
+    for col, values in filters.items():
+        cube = cube[cube[col].isin(values)]
+    return cube.groupby(by, observed=True)['count'].sum()
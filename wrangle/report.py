@@ -0,0 +1,97 @@
+''' Headless COPD report: python -m wrangle.report [COPD.csv] --out report '''
+import datetime
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from .explore import demographic_graph, gender_graph, gender_observed, race_graph, race_observed, year_graph
+from .prepare import build_cube
+from .stats import contingency_tables
+
+
+#---------REPORT-------------------
+def render_figure(name, plot, data, out_dir, formats):
+    ''' Draws one plotting function on the non-interactive Agg backend and saves every figure it opens
+        (runs in a worker process). Returns the written files and the render time.
+    '''
+    plt.switch_backend('Agg')
+    plt.close('all')
+    start = time.perf_counter()
+    # seaborn/pandas deprecation warnings would otherwise repeat once per worker
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        plot(data)
+    files = []
+    figures = plt.get_fignums()
+    for i, number in enumerate(figures, start=1):
+        figure = plt.figure(number)
+        stem = name if len(figures) == 1 else f'{name}_{i}'
+        for fmt in formats:
+            files.append(f'{stem}.{fmt}')
+            figure.savefig(os.path.join(out_dir, files[-1]), bbox_inches='tight')
+    plt.close('all')
+    return files, time.perf_counter() - start
+
+
+def write_report_index(out_dir, rendered, image_format='png'):
+    ''' Writes index.html (every figure in image_format with its render time) and timings.json '''
+    with open(os.path.join(out_dir, 'timings.json'), 'w') as f:
+        json.dump(rendered, f, indent=2)
+    sections = []
+    for name, figure in rendered.items():
+        images = ''.join(f'<img src="{file}" alt="{name}" style="max-width:100%">'
+                         for file in figure['files'] if file.endswith('.' + image_format))
+        sections.append(f'<h2>{name}</h2><p>Rendered in {figure["seconds"]:.2f}s</p>{images}')
+    with open(os.path.join(out_dir, 'index.html'), 'w') as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>COPD Prevalence Report</title></head>'
+                f'<body><h1>COPD Prevalence Report</h1><p>Generated {datetime.datetime.now():%Y-%m-%d %H:%M}</p>'
+                + ''.join(sections) + '</body></html>')
+
+
+def build_report(sample_train, out_dir='report', formats=('png',), n_jobs=None):
+    ''' Renders every EDA figure headlessly into out_dir, plus index.html and timings.json.
+        The count cube and contingency tables are computed once here; each figure is then drawn from
+        those small tables in a process pool, so a nightly job never needs a display.
+        Returns {figure: {'files': [...], 'seconds': render time}}.
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    cube = build_cube(sample_train)
+    tables = contingency_tables(sample_train, ['Yes_female', 'Race/Ethnicity'])
+    figures = {'demographics': (demographic_graph, cube),
+               'gender': (gender_graph, tables['Yes_female']),
+               'gender_observed': (gender_observed, tables['Yes_female']),
+               'race': (race_graph, cube),
+               'race_observed': (race_observed, tables['Race/Ethnicity']),
+               'year': (year_graph, cube)}
+
+    rendered = {}
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        futures = {name: pool.submit(render_figure, name, plot, data, out_dir, formats)
+                   for name, (plot, data) in figures.items()}
+        for name, future in futures.items():
+            files, seconds = future.result()
+            rendered[name] = {'files': files, 'seconds': seconds}
+    write_report_index(out_dir, rendered, formats[0])
+    return rendered
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build the headless COPD report from a prepared COPD.csv')
+    parser.add_argument('prepared', nargs='?', default='COPD.csv', help='csv written by prep_copd')
+    parser.add_argument('--out', default='report', help='output directory')
+    parser.add_argument('--formats', default='png', help='comma separated figure formats, e.g. png,svg')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes')
+    args = parser.parse_args()
+
+    # only the CLI splits; build_report itself never needs scikit-learn
+    from .split import split_sample
+    sample_train, _, _ = split_sample(pd.read_csv(args.prepared))
+    rendered = build_report(sample_train, args.out, tuple(args.formats.split(',')), args.jobs)
+    for name, figure in rendered.items():
+        print(f"{name:<16} {figure['seconds']:6.2f}s  {', '.join(figure['files'])}")
@@ -0,0 +1,115 @@
+''' Train/validate/test splits of the prepared COPD frame '''
+import numpy as np
+from sklearn.model_selection import train_test_split, KFold, StratifiedKFold
+
+from .features import build_feature_matrix
+from .instrument import traced
+
+
+#-------------- SPLIT-------
+@traced()
+def split_sample(df_sample):
+    ''' The below functions were created in regression excercises and will be aggregated to make a master clean_data function for final 
+        report
+    '''
+    split = split_indices(df_sample, random_state=42)
+    sample_train, sample_validate, sample_test = split.frame('train'), split.frame('validate'), split.frame('test')
+    print(f'Train shape: {sample_train.shape}')
+    print(f'Validate shape: {sample_validate.shape}')
+    print(f'Test shape: {sample_test.shape}')
+    return sample_train, sample_validate, sample_test 
+
+@traced()
+def X_y_split(sample_train, sample_validate, sample_test):
+    #Splitting the data in to X and Y to take out the data with curn and those without 
+    sample_X_train = sample_train.select_dtypes(include='number').drop(columns=['Yes_COPD'])
+    sample_y_train = sample_train.select_dtypes(include='number').Yes_COPD
+    
+    sample_X_validate = sample_validate.select_dtypes(include='number').drop(columns=['Yes_COPD'])
+    sample_y_validate = sample_validate.select_dtypes(include='number').Yes_COPD
+    
+    sample_X_test = sample_test.select_dtypes(include='number').drop(columns=['Yes_COPD'])
+    sample_y_test = sample_test.select_dtypes(include='number').Yes_COPD
+    return sample_X_train, sample_y_train, sample_X_validate, sample_y_validate, sample_X_test, sample_y_test
+
+
+class IndexSplit:
+    ''' Splits held as integer row positions into one frame ({'train': positions, ...}).
+        Rows are only gathered when a split's frame, X/y or feature matrix is asked for.
+    '''
+    def __init__(self, df_sample, indices, target='Yes_COPD'):
+        self.df_sample = df_sample
+        self.indices = indices
+        self.target = target
+
+    def __repr__(self):
+        sizes = ', '.join(f'{name}={len(rows):,}' for name, rows in self.indices.items())
+        return f'IndexSplit({sizes})'
+
+    @property
+    def features(self):
+        ''' Numeric columns other than the target, as in X_y_split '''
+        return [col for col in self.df_sample.select_dtypes(include='number').columns if col != self.target]
+
+    def frame(self, name):
+        ''' All columns of one split '''
+        return self.df_sample.iloc[self.indices[name]]
+
+    def X_y(self, name):
+        ''' Feature frame and target series of one split, gathering only those columns '''
+        rows = self.indices[name]
+        columns = self.df_sample.columns.get_indexer(self.features)
+        return self.df_sample.iloc[rows, columns], self.df_sample[self.target].iloc[rows]
+
+    def arrays(self, name, dtype=np.float32):
+        ''' C-contiguous feature matrix and target array of one split, filled column by column '''
+        rows = self.indices[name]
+        features = self.features
+        X = np.empty((len(rows), len(features)), dtype=dtype)
+        for j, col in enumerate(features):
+            X[:, j] = self.df_sample[col].to_numpy()[rows]
+        return X, self.df_sample[self.target].to_numpy()[rows]
+
+    def matrix(self, name, layout='dense', schema=None):
+        ''' FeatureMatrix of one split, gathered straight from the row positions; pass the train
+            matrix's schema for the other splits
+        '''
+        return build_feature_matrix(self.df_sample, self.target, self.indices[name], self.features, layout, schema)
+
+
+def _positions(df_sample):
+    ''' Row positions 0..n-1 in the smallest integer dtype that holds them '''
+    return np.arange(len(df_sample), dtype=np.int32 if len(df_sample) < 2**31 else np.int64)
+
+
+@traced()
+def split_indices(df_sample, stratify=None, random_state=42):
+    ''' Train/validate/test (60/20/20) row positions, the same rows split_sample returns for the same seed.
+        stratify='Yes_COPD' keeps the COPD rate equal across the splits.
+    '''
+    positions = _positions(df_sample)
+    labels = df_sample[stratify].to_numpy() if stratify else None
+    train_validate, test = train_test_split(positions, test_size=0.2, random_state=random_state, stratify=labels)
+    train, validate = train_test_split(train_validate, test_size=0.25, random_state=random_state,
+                                       stratify=None if labels is None else labels[train_validate])
+    return IndexSplit(df_sample, {'train': train, 'validate': validate, 'test': test})
+
+
+def kfold_indices(df_sample, k=5, stratify=None, random_state=42):
+    ''' Yields k train/validate IndexSplits, stratified on the stratify column when given '''
+    positions = _positions(df_sample)
+    if stratify:
+        folds = StratifiedKFold(n_splits=k, shuffle=True, random_state=random_state).split(positions, df_sample[stratify])
+    else:
+        folds = KFold(n_splits=k, shuffle=True, random_state=random_state).split(positions)
+    for train, validate in folds:
+        yield IndexSplit(df_sample, {'train': positions[train], 'validate': positions[validate]})
+
+
+def year_split_indices(df_sample, validate_year, test_year):
+    ''' Time-based split on Year: train before validate_year, validate up to test_year, test from test_year on '''
+    year = df_sample['Year'].to_numpy()
+    positions = _positions(df_sample)
+    return IndexSplit(df_sample, {'train': positions[year < validate_year],
+                                  'validate': positions[(year >= validate_year) & (year < test_year)],
+                                  'test': positions[year >= test_year]})
@@ -0,0 +1,295 @@
+''' Contingency tables, chi-square and Spearman tests and their resampling versions '''
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from .prepare import CONTINGENCY_COLUMNS
+
+
+#------- CONTINGENCY TABLES-----
+
+def factorize_column(values):
+    ''' Integer codes and labels of a column; categoricals reuse their codes, NaN is -1 '''
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=True)
+
+
+def count_table(y_codes, y_labels, x_codes, x_labels, target, column):
+    ''' Yes_COPD x column counts from integer codes with one np.bincount, laid out like pd.crosstab '''
+    valid = (y_codes >= 0) & (x_codes >= 0)
+    cells = y_codes[valid].astype(np.int64) * len(x_labels) + x_codes[valid]
+    counts = np.bincount(cells, minlength=len(y_labels) * len(x_labels)).reshape(len(y_labels), len(x_labels))
+    # like crosstab, leave out categories that never occur
+    observed = counts.sum(axis=0) > 0
+    return pd.DataFrame(counts[:, observed], index=pd.Index(y_labels, name=target),
+                        columns=pd.Index(x_labels[observed], name=column))
+
+
+def contingency_tables(sample_train, columns=CONTINGENCY_COLUMNS, target='Yes_COPD'):
+    ''' Yes_COPD x column count tables for every column, built in one pass over integer codes.
+        Nothing is cached: compute the tables once and pass them (or one of them) to the stat and
+        graph functions, which take a table wherever they take the rows, as build_report does.
+    '''
+    y_codes, y_labels = factorize_column(sample_train[target])
+    tables = {}
+    for col in columns:
+        x_codes, x_labels = factorize_column(sample_train[col])
+        tables[col] = count_table(y_codes, y_labels, x_codes, x_labels, target, col)
+    return tables
+
+
+def contingency_table(sample_train, column, target='Yes_COPD'):
+    ''' Yes_COPD x column count table (same layout as pd.crosstab) '''
+    return contingency_tables(sample_train, [column], target)[column]
+
+
+def observed_table(data, column, target='Yes_COPD'):
+    ''' data itself when it already is a target x column count table, otherwise the table of its rows '''
+    if data.index.name == target and data.columns.name == column:
+        return data
+    return contingency_table(data, column, target)
+
+
+def chi_square_tests(sample_train, columns=CONTINGENCY_COLUMNS, alpha=0.05, tables=None):
+    ''' Chi-square test of independence and Cramér's V for every column, as a tidy DataFrame with one
+        row per column. Pass tables (a contingency_tables result) to reuse counts already computed;
+        expected_counts gives the expected counts.
+    '''
+    tables = tables if tables is not None else contingency_tables(sample_train, columns)
+    rows = []
+    for col in columns:
+        observed = tables[col]
+        chi2, p, degf, expected = stats.chi2_contingency(observed)
+        rows.append({'column': col, 'chi2': chi2, 'p_value': p, 'dof': degf,
+                     # uncorrected, like the resampled cramers_v, although chi2 has Yates' correction on 2x2 tables
+                     'cramers_v': float(cramers_v_statistic(observed.to_numpy())),
+                     'n': observed.to_numpy().sum(), 'min_expected': expected.min(), 'reject_null': p < alpha})
+    return pd.DataFrame(rows)
+
+
+def expected_counts(tables, target='Yes_COPD'):
+    ''' Observed and expected (under independence) counts of every table in long form:
+        column, value, Yes_COPD, observed, expected
+    '''
+    rows = []
+    for col, observed in tables.items():
+        expected = stats.contingency.expected_freq(observed.to_numpy())
+        long = observed.stack().rename('observed').reset_index()
+        rows.append(pd.DataFrame({'column': col, 'value': long[col].astype(str), target: long[target],
+                                  'observed': long['observed'], 'expected': expected.ravel()}))
+    return pd.concat(rows, ignore_index=True)
+
+
+#------- GENDER, RACE & YEAR STATS-----
+def gender_stat(sample_train):
+    ''' This functions chi-square stat for gender''' 
+    alpha = 0.05
+    gender_observed = observed_table(sample_train, 'Yes_female')
+    chi2, p, degf, expected = stats.chi2_contingency(gender_observed)
+    print('Gender Observed')
+    print(gender_observed.values)
+    print('\nExpected')
+    print(expected.astype(int))
+    print('\n----')
+    print(f'chi^2 = {chi2:.4f}')
+    print(f'p_value = {p:.4f}')
+    print(f'The p-value is less than the alpha: {p < alpha}')
+    if p < alpha:
+        print('We reject the null')
+    else:
+        print("we fail to reject the null")
+
+
+def race_stats(sample_train):
+    ''' This functions chi-square stat for race''' 
+    alpha = 0.05
+    race_observed = observed_table(sample_train, 'Race/Ethnicity')
+    chi2, p, degf, expected = stats.chi2_contingency(race_observed)
+    print('Race Observed')
+    print(race_observed.values)
+    print('\nExpected')
+    print(expected.astype(int))
+    print('\n----')
+    print(f'chi^2 = {chi2:.4f}')
+    print(f'p-value = {p:.4f}')
+    print(f'The p-value is less than the alpha: {p < alpha}')
+    if p < alpha:
+        print('We reject the null')
+    else:
+        print("we fail to reject the null")
+
+
+    #Advised to do Chi-square stat test 
+def year_stat1(sample_train, sample_validate):
+    ''' This functions chi-square stat for year''' 
+    alpha = 0.05
+    year_observed = observed_table(sample_train, 'Year')
+    chi2, p, degf, expected = stats.chi2_contingency(year_observed)
+    print('Year Observed')
+    print(year_observed.values)
+    print('\nExpected')
+    print(expected.astype(int))
+    print('\n----')
+    print(f'chi^2 = {chi2:.4f}')
+    print(f'p_value = {p:.4f}')
+    print(f'The p-value is less than the alpha: {p < alpha}')
+    if p < alpha:
+        print('We reject the null')
+    else:
+        print("we fail to reject the null")
+     
+    
+def year_stat(sample_train, sample_validate):
+    alpha = 0.05
+
+    # Compute Spearman correlation
+    train_spearman_corr, train_p_value = stats.spearmanr(sample_train['Yes_COPD'], sample_train['Year'])
+    val_spearman_corr, val_p_value = stats.spearmanr(sample_validate['Yes_COPD'], sample_validate['Year'])
+    # Print the results
+    print("Spearman Train Correlation Coefficient:", train_spearman_corr,)
+    print("Spearman Validate Correlation Coefficient:", val_spearman_corr)
+    print("Train P-Value:", train_p_value)
+    print("Validate P-Value:", val_p_value)
+
+    if val_p_value < 0.05:
+        print("The relationship is statistically significant.")
+    else:
+        print("The relationship is not statistically significant.")
+
+
+#------- RESAMPLING TESTS-----
+def chi2_statistic(tables):
+    ''' Pearson chi-square (no continuity correction) of a batch of count tables shaped (..., rows, cols) '''
+    tables = np.asarray(tables, dtype=np.float64)
+    n = tables.sum(axis=(-2, -1), keepdims=True)
+    expected = tables.sum(axis=-1, keepdims=True) * tables.sum(axis=-2, keepdims=True) / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # categories missing from a resample have zero expected count and add nothing
+        return np.nansum((tables - expected) ** 2 / expected, axis=(-2, -1))
+
+
+def cramers_v_statistic(tables):
+    ''' Cramér's V of a batch of count tables '''
+    tables = np.asarray(tables, dtype=np.float64)
+    n = tables.sum(axis=(-2, -1))
+    return np.sqrt(chi2_statistic(tables) / (n * max(min(tables.shape[-2:]) - 1, 1)))
+
+
+def spearman_statistic(tables):
+    ''' Spearman correlation between the row label and the ordered column label (e.g. Yes_COPD and Year)
+        of a batch of count tables, computed from midranks instead of rows
+    '''
+    tables = np.asarray(tables, dtype=np.float64)
+    row_n, col_n = tables.sum(axis=-1), tables.sum(axis=-2)
+    n = row_n.sum(axis=-1, keepdims=True)
+    # midrank of each row/column value, centred on the mean rank (n + 1) / 2
+    row_rank = np.cumsum(row_n, axis=-1) - (row_n - 1) / 2 - (n + 1) / 2
+    col_rank = np.cumsum(col_n, axis=-1) - (col_n - 1) / 2 - (n + 1) / 2
+    cov = np.einsum('...ij,...i,...j->...', tables, row_rank, col_rank)
+    var_rows = (row_n * row_rank ** 2).sum(axis=-1)
+    var_cols = (col_n * col_rank ** 2).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt(var_rows * var_cols)
+
+
+# Resampling statistics: name -> batched function of count tables
+RESAMPLING_STATISTICS = {'chi2': chi2_statistic, 'cramers_v': cramers_v_statistic, 'spearman': spearman_statistic}
+
+
+def two_row_table(table):
+    ''' table as an int64 array, or a ValueError unless it is a 2 x k table (both Yes_COPD classes) '''
+    table = np.asarray(table, dtype=np.int64)
+    if table.ndim != 2 or table.shape[0] != 2:
+        raise ValueError(f'Resampling needs a 2 x k Yes_COPD table (both classes present), got shape {table.shape}')
+    return table
+
+
+def resample_tables(kind, table, size, seed):
+    ''' size resampled count tables of a 2 x k table.
+        'permutation' shuffles the Yes_COPD labels: with the margins fixed that is a multivariate
+        hypergeometric draw of the COPD row. 'bootstrap' resamples rows: a multinomial draw of the cells.
+    '''
+    rng = np.random.default_rng(seed)
+    table = two_row_table(table)
+    if kind == 'permutation':
+        col_n = table.sum(axis=0)
+        second_row = rng.multivariate_hypergeometric(col_n, table[1].sum(), size=size)
+        return np.stack([col_n - second_row, second_row], axis=1)
+    cells = table.ravel()
+    return rng.multinomial(cells.sum(), cells / cells.sum(), size=size).reshape((size,) + table.shape)
+
+
+def resampled_statistic(kind, table, statistic, size, seed):
+    ''' Statistic of size resampled tables (one chunk of a process-pool run) '''
+    return RESAMPLING_STATISTICS[statistic](resample_tables(kind, table, size, seed))
+
+
+def resample(kind, table, statistic, n_resamples, random_state=42, n_jobs=None, chunk_size=2000, pool=None):
+    ''' Statistic over n_resamples resampled tables, in chunks spread across a process pool.
+        Each chunk gets its own seed spawned from random_state, so results are reproducible.
+        Pass pool to reuse an open executor instead of starting one per call.
+    '''
+    if n_resamples < 1:
+        raise ValueError(f'n_resamples must be at least 1, got {n_resamples}')
+    table = two_row_table(table)
+    sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    if pool is None and (n_jobs == 1 or len(sizes) == 1):
+        return np.concatenate([resampled_statistic(kind, table, statistic, size, seed) for size, seed in zip(sizes, seeds)])
+    if pool is not None:
+        chunks = pool.map(resampled_statistic, [kind] * len(sizes), [table] * len(sizes), [statistic] * len(sizes), sizes, seeds)
+        return np.concatenate(list(chunks))
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        return resample(kind, table, statistic, n_resamples, random_state, n_jobs, chunk_size, pool)
+
+
+def permutation_test(table, statistic='chi2', n_resamples=10000, random_state=42, n_jobs=None, pool=None):
+    ''' Permutation p-value of a Yes_COPD x column table (two-sided for spearman) '''
+    observed = RESAMPLING_STATISTICS[statistic](two_row_table(table))
+    null = resample('permutation', table, statistic, n_resamples, random_state, n_jobs, pool=pool)
+    if statistic == 'spearman':
+        observed_extreme, null = abs(observed), np.abs(null)
+    else:
+        observed_extreme = observed
+    # count the observed table itself so the p-value is never exactly zero
+    p = (1 + np.sum(null >= observed_extreme - 1e-12)) / (n_resamples + 1)
+    return float(observed), float(p)
+
+
+def bootstrap_ci(table, statistic='cramers_v', n_resamples=10000, confidence=0.95, random_state=42, n_jobs=None,
+                 pool=None):
+    ''' Percentile bootstrap confidence interval of a statistic of a Yes_COPD x column table '''
+    replicates = resample('bootstrap', table, statistic, n_resamples, random_state, n_jobs, pool=pool)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(replicates, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def resampling_tests(sample_train, n_resamples=10000, confidence=0.95, random_state=42, n_jobs=None, tables=None):
+    ''' Permutation p-values and bootstrap confidence intervals for the gender and race chi-square tests
+        and the year Spearman correlation, as a tidy DataFrame. Resamples are drawn from the count tables
+        (pass tables, a contingency_tables result, to reuse counts already computed).
+    '''
+    tests = [('gender', 'Yes_female', 'chi2', 'cramers_v'),
+             ('race', 'Race/Ethnicity', 'chi2', 'cramers_v'),
+             ('year', 'Year', 'spearman', 'spearman')]
+    if tables is None:
+        tables = contingency_tables(sample_train, [column for _, column, _, _ in tests])
+    rows = []
+    with contextlib.ExitStack() as stack:
+        # one pool shared by all six resampling runs
+        pool = None if n_jobs == 1 else stack.enter_context(ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()))
+        for name, column, test_statistic, effect_statistic in tests:
+            table = two_row_table(tables[column].to_numpy())
+            observed, p = permutation_test(table, test_statistic, n_resamples, random_state, n_jobs, pool)
+            low, high = bootstrap_ci(table, effect_statistic, n_resamples, confidence, random_state, n_jobs, pool)
+            rows.append({'test': name, 'column': column, 'statistic': test_statistic, 'observed': observed,
+                         'permutation_p': p, 'effect': effect_statistic,
+                         'effect_observed': float(RESAMPLING_STATISTICS[effect_statistic](table)),
+                         'ci_low': low, 'ci_high': high, 'n_resamples': n_resamples})
+    return pd.DataFrame(rows)
@@ -0,0 +1,138 @@
+''' Synthetic CDI-shaped csv files for benchmarks and CI, where the real CDI csv cannot be shipped.
+    python -m wrangle.synthetic synthetic_cdi.csv --rows 1M
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Every column of the real CDI csv, in file order
+CDI_COLUMNS = ['YearStart', 'YearEnd', 'LocationAbbr', 'LocationDesc', 'DataSource', 'Topic', 'Question', 'Response',
+               'DataValueUnit', 'DataValueType', 'DataValue', 'DataValueAlt', 'DataValueFootnoteSymbol',
+               'DatavalueFootnote', 'LowConfidenceLimit', 'HighConfidenceLimit', 'StratificationCategory1',
+               'Stratification1', 'StratificationCategory2', 'Stratification2', 'StratificationCategory3',
+               'Stratification3', 'GeoLocation', 'ResponseID', 'LocationID', 'TopicID', 'QuestionID',
+               'DataValueTypeID', 'StratificationCategoryID1', 'StratificationID1', 'StratificationCategoryID2',
+               'StratificationID2', 'StratificationCategoryID3', 'StratificationID3']
+
+# Topic -> approximate share of the real CDI rows
+SYNTHETIC_TOPICS = {'Cardiovascular Disease': 15, 'Diabetes': 12, 'Chronic Obstructive Pulmonary Disease': 11,
+                    'Nutrition, Physical Activity, and Weight Status': 8, 'Overarching Conditions': 8, 'Asthma': 7,
+                    'Tobacco': 7, 'Cancer': 6, 'Alcohol': 5, 'Arthritis': 4, 'Oral Health': 3, 'Older Adults': 2,
+                    'Immunization': 2, 'Chronic Kidney Disease': 2, 'Mental Health': 1, 'Reproductive Health': 1,
+                    'Disability': 1}
+
+# StratificationCategory1 -> (share of rows, {Stratification1: relative weight})
+SYNTHETIC_STRATIFICATIONS = {
+    'Overall': (20, {'Overall': 1}),
+    'Gender': (25, {'Male': 1, 'Female': 1}),
+    'Race/Ethnicity': (55, {'White, non-Hispanic': 20, 'Black, non-Hispanic': 18, 'Hispanic': 18,
+                            'Asian or Pacific Islander': 12, 'American Indian or Alaska Native': 12,
+                            'Other, non-Hispanic': 10, 'Multiracial, non-Hispanic': 10}),
+}
+
+# LocationAbbr -> (LocationDesc, longitude, latitude); the national 'US' rows have no point
+SYNTHETIC_LOCATIONS = {
+    'AL': ('Alabama', -86.63, 32.84), 'AK': ('Alaska', -147.72, 64.85), 'AZ': ('Arizona', -111.76, 34.87),
+    'AR': ('Arkansas', -92.27, 34.75), 'CA': ('California', -120.99, 37.64), 'CO': ('Colorado', -106.13, 38.84),
+    'CT': ('Connecticut', -72.65, 41.56), 'DE': ('Delaware', -75.58, 39.01), 'DC': ('District of Columbia', -77.04, 38.91),
+    'FL': ('Florida', -81.93, 28.93), 'GA': ('Georgia', -83.63, 32.84), 'HI': ('Hawaii', -157.86, 21.30),
+    'ID': ('Idaho', -114.36, 43.68), 'IL': ('Illinois', -88.99, 40.49), 'IN': ('Indiana', -86.15, 39.77),
+    'IA': ('Iowa', -93.82, 42.47), 'KS': ('Kansas', -98.20, 38.35), 'KY': ('Kentucky', -84.77, 37.65),
+    'LA': ('Louisiana', -92.45, 31.31), 'ME': ('Maine', -68.99, 45.25), 'MD': ('Maryland', -76.61, 39.29),
+    'MA': ('Massachusetts', -72.08, 42.27), 'MI': ('Michigan', -84.71, 44.66), 'MN': ('Minnesota', -94.79, 46.36),
+    'MS': ('Mississippi', -89.54, 32.75), 'MO': ('Missouri', -92.57, 38.64), 'MT': ('Montana', -109.42, 47.07),
+    'NE': ('Nebraska', -99.37, 41.64), 'NV': ('Nevada', -116.75, 39.49), 'NH': ('New Hampshire', -71.50, 43.66),
+    'NJ': ('New Jersey', -74.27, 40.13), 'NM': ('New Mexico', -106.24, 34.52), 'NY': ('New York', -75.54, 42.83),
+    'NC': ('North Carolina', -79.16, 35.47), 'ND': ('North Dakota', -100.12, 47.48), 'OH': ('Ohio', -82.40, 40.06),
+    'OK': ('Oklahoma', -97.52, 35.47), 'OR': ('Oregon', -120.16, 44.57), 'PA': ('Pennsylvania', -77.86, 40.79),
+    'RI': ('Rhode Island', -71.52, 41.71), 'SC': ('South Carolina', -81.05, 33.99), 'SD': ('South Dakota', -100.37, 44.35),
+    'TN': ('Tennessee', -85.77, 35.68), 'TX': ('Texas', -99.43, 31.83), 'UT': ('Utah', -111.59, 39.36),
+    'VT': ('Vermont', -72.52, 43.63), 'VA': ('Virginia', -78.46, 37.54), 'WA': ('Washington', -120.47, 47.52),
+    'WV': ('West Virginia', -80.71, 38.67), 'WI': ('Wisconsin', -89.82, 44.39), 'WY': ('Wyoming', -108.11, 43.24),
+    'PR': ('Puerto Rico', -66.59, 18.22), 'GU': ('Guam', 144.79, 13.44), 'VI': ('Virgin Islands', -64.90, 18.34),
+    'US': ('United States', None, None),
+}
+
+# First and last YearStart; later years carry more indicators, as in the real file
+SYNTHETIC_YEARS = (2001, 2021)
+
+
+def _weights(values):
+    weights = np.asarray(values, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def synthetic_cdi_chunk(rows, rng, malformed_rate=0.001):
+    ''' A DataFrame of CDI-shaped rows drawn with rng '''
+    topics = np.array(list(SYNTHETIC_TOPICS), dtype=object)
+    topic = topics[rng.choice(len(topics), rows, p=_weights(list(SYNTHETIC_TOPICS.values())))]
+
+    categories = list(SYNTHETIC_STRATIFICATIONS)
+    category_codes = rng.choice(len(categories), rows, p=_weights([share for share, _ in SYNTHETIC_STRATIFICATIONS.values()]))
+    category = np.array(categories, dtype=object)[category_codes]
+    stratification = np.empty(rows, dtype=object)
+    for code, (_, values) in enumerate(SYNTHETIC_STRATIFICATIONS.values()):
+        rows_in = np.flatnonzero(category_codes == code)
+        names = np.array(list(values), dtype=object)
+        stratification[rows_in] = names[rng.choice(len(names), len(rows_in), p=_weights(list(values.values())))]
+
+    states = list(SYNTHETIC_LOCATIONS)
+    state_codes = rng.integers(0, len(states), rows)
+    points = np.array([f'POINT ({lon} {lat})' if lon is not None else '' for _, lon, lat in SYNTHETIC_LOCATIONS.values()],
+                      dtype=object)
+    geo = points[state_codes]
+    geo[rng.random(rows) < malformed_rate] = 'POINT (nan)'
+
+    first, last = SYNTHETIC_YEARS
+    years = np.arange(first, last + 1)
+    year = rng.choice(years, rows, p=_weights(years - first + 5)).astype(np.int16)
+
+    value = np.round(rng.uniform(1, 60, rows), 1)
+    chunk = pd.DataFrame({
+        'YearStart': year, 'YearEnd': year, 'LocationAbbr': np.array(states, dtype=object)[state_codes],
+        'LocationDesc': np.array([desc for desc, _, _ in SYNTHETIC_LOCATIONS.values()], dtype=object)[state_codes],
+        'DataSource': 'BRFSS', 'Topic': topic, 'Question': 'Prevalence among adults aged >= 18 years',
+        'DataValueUnit': '%', 'DataValueType': 'Crude Prevalence', 'DataValue': value, 'DataValueAlt': value,
+        'LowConfidenceLimit': np.round(value * 0.9, 1), 'HighConfidenceLimit': np.round(value * 1.1, 1),
+        'StratificationCategory1': category, 'Stratification1': stratification, 'GeoLocation': geo,
+        'LocationID': state_codes + 1, 'DataValueTypeID': 'CRDPREV',
+    })
+    return chunk.reindex(columns=CDI_COLUMNS)
+
+
+def generate_cdi(path, rows, chunksize=1000000, random_state=42, malformed_rate=0.001, verbose=True):
+    ''' Writes a synthetic CDI csv with the given number of rows, chunk by chunk so memory stays bounded
+        at any scale. The same rows, chunksize and random_state always give the same file. Returns path.
+    '''
+    rng = np.random.default_rng(random_state)
+    start = time.perf_counter()
+    tmp_path = path + '.tmp'
+    # rows=0 still writes the header
+    for offset in range(0, max(rows, 1), chunksize):
+        chunk = synthetic_cdi_chunk(min(chunksize, rows - offset), rng, malformed_rate)
+        chunk.to_csv(tmp_path, mode='w' if offset == 0 else 'a', header=offset == 0, index=False)
+    # rename at the end so a half-written file is never mistaken for a finished one
+    os.replace(tmp_path, path)
+    if verbose:
+        print(f'Wrote {rows:,} synthetic CDI rows to {path} in {time.perf_counter() - start:.1f}s')
+    return path
+
+
+def parse_rows(text):
+    ''' Row counts like '100k', '1M' or '2500000' '''
+    text = str(text).strip().upper()
+    scale = {'K': 1000, 'M': 1000000, 'B': 1000000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic CDI-shaped csv')
+    parser.add_argument('path', help='output csv')
+    parser.add_argument('--rows', default='1M', help="row count, e.g. 100k, 1M, 100M")
+    parser.add_argument('--chunksize', type=int, default=1000000, help='rows generated per chunk')
+    parser.add_argument('--seed', type=int, default=42, help='random state')
+    args = parser.parse_args()
+    generate_cdi(args.path, parse_rows(args.rows), args.chunksize, args.seed)